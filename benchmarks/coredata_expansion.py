@@ -0,0 +1,127 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Measure the cost of expanding core description sections
+
+Creates a chain of cores where each core depends on the next one, builds the
+EDAM for the first core and counts the calls to copy.deepcopy, including the
+recursive ones, with and without memoization of the expanded sections.
+
+Usage: python benchmarks/coredata_expansion.py [depth]
+"""
+
+import copy
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from fusesoc.capi2.coredata import CoreData
+from fusesoc.config import Config
+from fusesoc.coremanager import CoreManager
+from fusesoc.edalizer import Edalizer
+from fusesoc.librarymanager import Library
+from fusesoc.vlnv import Vlnv
+
+CORE_TEMPLATE = """CAPI=2:
+name: ::core{i}:0
+filesets:
+  rtl:
+    files:
+      - rtl/core{i}_a.v
+      - rtl/core{i}_b.v
+      - "sim ? (rtl/core{i}_sim.v)"
+      - "!sim ? (rtl/core{i}_synth.v)"
+    file_type: verilogSource
+    depend: [{depend}]
+  tb:
+    files: [tb/core{i}_tb.v]
+    file_type: verilogSource
+parameters:
+  width:
+    datatype: int
+    default: 8
+    paramtype: vlogparam
+targets:
+  default:
+    filesets: [rtl, "is_toplevel ? (tb)"]
+    parameters: [width]
+    toplevel: core{i}
+    tools:
+      icarus:
+        iverilog_options: [-g2012, "sim ? (-DSIM)"]
+"""
+
+
+def create_cores(root, depth):
+    for i in range(depth):
+        depend = f'"::core{i + 1}:0"' if i + 1 < depth else ""
+        with open(os.path.join(root, f"core{i}.core"), "w") as f:
+            f.write(CORE_TEMPLATE.format(i=i, depend=depend))
+
+
+def build_edam(core_dir, work_root):
+    config_file = os.path.join(work_root, "fusesoc.conf")
+    with open(config_file, "w") as f:
+        f.write(f"[main]\ncache_root = {os.path.join(work_root, 'cache')}\n")
+    cm = CoreManager(Config(config_file))
+    cm.add_library(Library("bench", core_dir), [])
+    edalizer = Edalizer(
+        toplevel=Vlnv("::core0"),
+        flags={"tool": "icarus", "target": "default", "sim": True},
+        core_manager=cm,
+        work_root=work_root,
+    )
+    start = time.perf_counter()
+    edalizer.run()
+    return time.perf_counter() - start
+
+
+def measure(core_dir, work_root, memoize):
+    calls = 0
+    deepcopy = copy.deepcopy
+
+    def counting_deepcopy(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return deepcopy(*args, **kwargs)
+
+    patches = [mock.patch("fusesoc.capi2.coredata.copy.deepcopy", counting_deepcopy)]
+    if not memoize:
+        patches.append(
+            mock.patch.object(
+                CoreData,
+                "_memoize",
+                lambda self, section, flags, expand: expand(),
+            )
+        )
+    for p in patches:
+        p.start()
+    try:
+        elapsed = build_edam(core_dir, work_root)
+    finally:
+        for p in patches:
+            p.stop()
+    return calls, elapsed
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        core_dir = os.path.join(tmp, "cores")
+        os.makedirs(core_dir)
+        create_cores(core_dir, depth)
+        work_root = os.path.join(tmp, "build")
+        os.makedirs(work_root)
+
+        print(f"Dependency chain of {depth} cores")
+        for memoize in [False, True]:
+            calls, elapsed = measure(core_dir, work_root, memoize)
+            label = "memoized" if memoize else "not memoized"
+            print(f"{label:>13}: {calls:6} deepcopy calls, {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Measure the cost of assembling the EDAM from the resolved cores
+
+Creates a design where a top core depends on a number of leaf cores with
+many files each, resolves the dependencies and then times create_edam when
+the per-core snippets are merged by copying the lists on every merge, like
+utils.merge_dict does, and when the lists are extended in place.
+
+Usage: python benchmarks/edam_assembly.py [cores] [files]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from fusesoc.config import Config
+from fusesoc.coremanager import CoreManager
+from fusesoc.edalizer import Edalizer
+from fusesoc.librarymanager import Library
+from fusesoc.utils import merge_dict
+from fusesoc.vlnv import Vlnv
+
+CORE_TEMPLATE = """CAPI=2:
+name: ::core{i}:0
+filesets:
+  rtl:
+    files: [{files}]
+    file_type: verilogSource
+    depend: [{depend}]
+targets:
+  default:
+    filesets: [rtl]
+    toplevel: core{i}
+"""
+
+
+def create_cores(root, cores, files):
+    for i in range(cores):
+        if i == 0:
+            depend = ", ".join(f'"::core{j}:0"' for j in range(1, cores))
+        else:
+            depend = ""
+        _files = ", ".join(f"rtl/core{i}_{j}.v" for j in range(files))
+        with open(os.path.join(root, f"core{i}.core"), "w") as f:
+            f.write(CORE_TEMPLATE.format(i=i, files=_files, depend=depend))
+
+
+def measure(edalizer, inplace):
+    patches = []
+    if not inplace:
+        patches.append(mock.patch("fusesoc.edalizer.merge_dict_inplace", merge_dict))
+    for p in patches:
+        p.start()
+    try:
+        start = time.perf_counter()
+        edalizer.create_edam()
+        elapsed = time.perf_counter() - start
+    finally:
+        for p in patches:
+            p.stop()
+    return elapsed
+
+
+def main():
+    cores = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        core_dir = os.path.join(tmp, "cores")
+        os.makedirs(core_dir)
+        create_cores(core_dir, cores, files)
+        work_root = os.path.join(tmp, "build")
+        os.makedirs(work_root)
+
+        config_file = os.path.join(work_root, "fusesoc.conf")
+        with open(config_file, "w") as f:
+            f.write(f"[main]\ncache_root = {os.path.join(work_root, 'cache')}\n")
+        cm = CoreManager(Config(config_file))
+        cm.add_library(Library("bench", core_dir), [])
+        edalizer = Edalizer(
+            toplevel=Vlnv("::core0"),
+            flags={"tool": "icarus", "target": "default"},
+            core_manager=cm,
+            work_root=work_root,
+        )
+        edalizer.run()
+
+        print(f"{cores} cores with {files} files each")
+        for inplace in [False, True]:
+            elapsed = measure(edalizer, inplace)
+            label = "in place" if inplace else "copied"
+            print(f"{label:>8}: {elapsed:.3f} s, {len(edalizer.edam['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
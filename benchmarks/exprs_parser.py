@@ -0,0 +1,73 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Compare the exprs parser with the pyparsing reference implementation
+
+Collects all strings containing conditional expressions from the core files
+in the test suite and parses each of them with both parsers.
+
+Usage: python benchmarks/exprs_parser.py [repeat]
+"""
+
+import glob
+import os
+import sys
+import time
+
+from fusesoc.capi2.exprs import _parse, _pyparsing_parse
+from fusesoc.utils import yaml_fread
+
+TESTS_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tests")
+
+
+def find_exprs(data):
+    if isinstance(data, dict):
+        for k, v in data.items():
+            yield from find_exprs(k)
+            yield from find_exprs(v)
+    elif isinstance(data, list):
+        for i in data:
+            yield from find_exprs(i)
+    elif isinstance(data, str) and "?" in data:
+        yield data
+
+
+def collect_exprs():
+    strings = []
+    for core_file in glob.glob(os.path.join(TESTS_DIR, "**", "*.core"), recursive=True):
+        try:
+            data = yaml_fread(core_file, remove_preamble=True)
+        except Exception:
+            continue
+        strings += find_exprs(data)
+    return strings
+
+
+def measure(parse, strings, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for string in strings:
+            try:
+                parse(string)
+            except ValueError:
+                pass
+    return time.perf_counter() - start
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    strings = collect_exprs()
+    print(f"Parsing {len(strings)} strings {repeat} times")
+
+    # Import pyparsing and build its parser outside of the measurement
+    _pyparsing_parse("a")
+
+    for name, parse in [("pyparsing", _pyparsing_parse), ("exprs", _parse)]:
+        elapsed = measure(parse, strings, repeat)
+        per_string = elapsed / (len(strings) * repeat) * 1e6
+        print(f"{name:>10}: {elapsed:.3f} s ({per_string:.1f} us per string)")
+
+
+if __name__ == "__main__":
+    main()
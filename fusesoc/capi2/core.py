@@ -7,14 +7,13 @@ import copy
 # FIXME: Add IP-XACT support
 import logging
 import os
-import shutil
 import warnings
-from filecmp import cmp
 from types import MappingProxyType
 from typing import Mapping, Optional
 
 from fusesoc import signature, utils
 from fusesoc.capi2.coredata import CoreData
+from fusesoc.export import ExportManifest
 from fusesoc.provider.provider import get_provider
 from fusesoc.vlnv import Vlnv
 
@@ -30,6 +29,8 @@ class Core:
         core_file,
         cache_root="",
         generated=False,
+        capi_data=None,
+        header=None,
     ):
         self.core_file = core_file
 
@@ -45,27 +46,74 @@ class Core:
 
         self.export_files = []
 
-        self._capi_data = self._parser.read(core_file)
+        self._capi_data = None
+        self._loaded_coredata = None
+        self._provider = None
 
-        # If original data is needed at some later stage we need to create
-        # deepcopy since CoreData might modify it.
-        self._coredata = CoreData(copy.deepcopy(self._capi_data))
+        # If a header (see CoreData.get_header) is given, the core file is
+        # not parsed until data outside of the header is needed. capi_data
+        # can be passed in when the core file was already parsed, e.g. by a
+        # worker process.
+        self._header = None if header is None else CoreData(header)
+        if header is None:
+            self._load(capi_data)
 
-        self.name = Vlnv(self._coredata.get_name())
+        self.name = Vlnv(self._header_coredata.get_name())
 
-        cd_provider = self._coredata.get_provider()
+        cd_provider = self._header_coredata.get_provider()
 
         if cd_provider:
             self.files_root = os.path.join(cache_root, self.name.sanitized_name)
-            self.provider = get_provider(cd_provider["name"])(
-                cd_provider, self.core_root, self.files_root
-            )
+            self._provider_class = get_provider(cd_provider["name"])
+            self._provider_config = cd_provider
         else:
             self.files_root = self.core_root
-            self.provider = None
+            self._provider_class = None
+
+        if header is None:
+            # Create the provider right away to report errors early
+            self._create_provider()
 
         self.is_generated = generated
 
+    def _load(self, capi_data=None):
+        if capi_data is None:
+            if self._header is not None:
+                self._debug("Parsing core file")
+            capi_data = self._parser.read(self.core_file)
+        self._capi_data = capi_data
+
+        # If original data is needed at some later stage we need to create
+        # deepcopy since CoreData might modify it.
+        self._loaded_coredata = CoreData(copy.deepcopy(self._capi_data))
+
+    @property
+    def _coredata(self):
+        if self._loaded_coredata is None:
+            self._load()
+        return self._loaded_coredata
+
+    @property
+    def _header_coredata(self):
+        """CoreData for the parts of the core covered by the header"""
+        if self._header is not None:
+            return self._header
+        return self._coredata
+
+    def _create_provider(self):
+        if self._provider is None and self._provider_class:
+            self._provider = self._provider_class(
+                self._provider_config,
+                self.core_root,
+                self.files_root,
+                cache_root=self.cache_root or None,
+            )
+        return self._provider
+
+    @property
+    def provider(self):
+        return self._create_provider()
+
     def __repr__(self):
         return str(self.name)
 
@@ -75,7 +123,7 @@ class Core:
         else:
             return "local"
 
-    def export(self, dst_dir, flags={}):
+    def export(self, dst_dir, flags={}, mode="copy"):
         src_files = [f["name"] for f in self.get_files(flags)]
 
         for k, v in self._get_vpi(flags).items():
@@ -93,10 +141,11 @@ class Core:
                         for filename, attributes in file.items():
                             src_files.append(filename)
 
+        manifest = ExportManifest(dst_dir, mode)
         dirs = list(set(map(os.path.dirname, src_files)))
         for d in dirs:
             if not os.path.isabs(d):
-                os.makedirs(os.path.join(dst_dir, d), exist_ok=True)
+                manifest.add_dir(d)
 
         for f in src_files:
             if f.startswith(".."):
@@ -119,22 +168,11 @@ class Core:
                         _dirs += " or " + self.files_root
                     raise RuntimeError(f"Cannot find {f} in {_dirs}")
 
-                dst = os.path.join(dst_dir, f)
-                # Only update if file is changed or doesn't exist
-                if not os.path.exists(dst) or not cmp(src, dst):
-                    try:
-                        shutil.copy2(src, dst)
-                    except IsADirectoryError:
-                        shutil.copytree(src, dst, dirs_exist_ok=True)
+                manifest.export(src, f)
 
         # Clean out leftover files from previous builds
-        for root, dirs, files in os.walk(dst_dir):
-            for f in files:
-                _abs_f = os.path.join(root, f)
-                _rel_f = os.path.normpath(os.path.relpath(_abs_f, dst_dir))
-
-                if _rel_f not in [os.path.normpath(x) for x in src_files]:
-                    os.remove(_abs_f)
+        manifest.finish()
+        return manifest
 
     def _get_script_names(self, flags):
         target_name, target = self._get_target(flags)
@@ -155,8 +193,7 @@ class Core:
                                 )
                             )
 
-                        cd_scripts[script]["name"] = script
-                        hooks[hook].append(cd_scripts[script])
+                        hooks[hook].append(dict(cd_scripts[script], name=script))
 
         return hooks
 
@@ -209,8 +246,7 @@ class Core:
         for hook, scripts in self._get_script_names(flags).items():
             hooks[hook] = []
             for script in scripts:
-                env = script.get("env", {})
-                env["FILES_ROOT"] = files_root
+                env = dict(script.get("env", {}), FILES_ROOT=files_root)
                 _script = {
                     "name": script.get("name", ""),
                     "cmd": [str(x) for x in script.get("cmd", [])],
@@ -257,7 +293,7 @@ class Core:
     def get_depends(self, flags):  # Add use flags?
         depends = []
         self._debug("Getting dependencies for flags {}".format(str(flags)))
-        for fs in self._get_filesets(flags):
+        for fs in self._get_filesets(flags, self._header_coredata):
             depends += [Vlnv(d) for d in fs["depend"]]
         return depends
 
@@ -269,7 +305,7 @@ class Core:
         _src_files = []
         for f in src_files:
             for filename, attributes in f.items():
-                attributes["name"] = filename
+                attributes = dict(attributes, name=filename)
 
                 # Remove all key-value-pairs with values that are either bool with
                 # value False or str of length 0
@@ -289,15 +325,14 @@ class Core:
         cd_generators = self._coredata.get_generators(flags)
         generators = {}
         for k, v in cd_generators.items():
-            v.update({"root": self.files_root})
-            generators[k] = v
+            generators[k] = dict(v, root=self.files_root, vlnv=str(self.name))
 
         return generators
 
     def get_virtuals(self, flags={}):
         """Get a list of "virtual" VLNVs provided by this core."""
 
-        return [Vlnv(x) for x in self._coredata.get_virtual(flags)]
+        return [Vlnv(x) for x in self._header_coredata.get_virtual(flags)]
 
     def get_parameters(self, flags={}, ext_parameters={}):
         def _parse_param_value(name, datatype, default):
@@ -454,7 +489,7 @@ class Core:
                 )
             gen_inst = cd_generate[gen_name]
             params = (
-                utils.merge_dict(gen_inst["parameters"], gen["params"])
+                utils.merge_dict(copy.deepcopy(gen_inst["parameters"]), gen["params"])
                 if "parameters" in gen_inst
                 else {}
             )
@@ -592,10 +627,10 @@ Targets:
     def _debug(self, msg):
         logger.debug("{} : {}".format(str(self.name), msg))
 
-    def _get_target(self, flags):
+    def _get_target(self, flags, coredata=None):
         self._debug(" Resolving target for flags '{}'".format(str(flags)))
 
-        cd_target = self._coredata.get_targets(flags)
+        cd_target = (coredata or self._coredata).get_targets(flags)
         target_name = None
         if flags.get("is_toplevel") and flags.get("target"):
             target_name = flags.get("target")
@@ -609,14 +644,15 @@ Targets:
             self._debug("Matched no target")
             return target_name, {}
 
-    def _get_filesets(self, flags):
+    def _get_filesets(self, flags, coredata=None):
         self._debug("Getting filesets for flags '{}'".format(str(flags)))
-        target_name, target = self._get_target(flags)
+        coredata = coredata or self._coredata
+        target_name, target = self._get_target(flags, coredata)
         if not target:
             return []
         filesets = []
 
-        cd_filesets = self._coredata.get_filesets(flags)
+        cd_filesets = coredata.get_filesets(flags)
 
         for fs in target.get("filesets", []):
             if fs not in cd_filesets:
@@ -634,7 +670,7 @@ Targets:
         return self.name
 
     def get_description(self):
-        return self._coredata.get_description()
+        return self._header_coredata.get_description()
 
     def get_license(self):
         return self._coredata.get("license")
@@ -5,6 +5,7 @@
 import copy
 
 from fusesoc.capi2.exprs import Exprs
+from fusesoc.utils import freeze
 
 
 class CoreData:
@@ -16,6 +17,10 @@ class CoreData:
         # _capi_data.
         self._append_lists(self._capi_data)
 
+        # Expanded sections, keyed by section name and the set of defined
+        # flags. The values are read-only, so they can be shared by callers.
+        self._memo = {}
+
     def _expand_use(self, data, flags):
         if isinstance(data, dict):
             remove = []
@@ -138,6 +143,28 @@ class CoreData:
 
         return s
 
+    def _memoize(self, section, flags, expand):
+        """Return the read-only result of expand() for section and flags
+
+        Expanding a section only depends on which flags are defined, so the
+        result is cached per set of defined flags.
+        """
+        try:
+            key = (section, frozenset(Exprs._flags_to_flag_defs(flags)))
+        except TypeError:
+            # Flags with values that can not be turned into flag definitions
+            return freeze(expand())
+        if key not in self._memo:
+            self._memo[key] = freeze(expand())
+        return self._memo[key]
+
+    def _expanded(self, section, flags, default):
+        return self._memoize(
+            section,
+            flags,
+            lambda: self._deepcopy_and_expand(section, flags) or default,
+        )
+
     def get(self, key, default=None):
         return self._capi_data.get(key, default)
 
@@ -150,7 +177,38 @@ class CoreData:
     def get_provider(self):
         return copy.deepcopy(self.get("provider"))
 
-    def get_filesets(self, flags):
+    def get_header(self):
+        """Return the subset of the core description needed to register it
+
+        The header contains the name, description, provider and virtual VLNVs
+        of the core, together with the parts of the targets and filesets that
+        determine its dependencies. A CoreData created from the header returns
+        the same results as the full CoreData for these.
+        """
+        header = {"name": self.get_name()}
+        for key in ["description", "provider", "virtual"]:
+            if key in self._capi_data:
+                header[key] = copy.deepcopy(self._capi_data[key])
+
+        targets = {}
+        for name, target in (self.get("targets") or {}).items():
+            targets[name] = {}
+            if target and "filesets" in target:
+                targets[name]["filesets"] = copy.deepcopy(target["filesets"])
+        if targets:
+            header["targets"] = targets
+
+        filesets = {}
+        for name, fs in (self.get("filesets") or {}).items():
+            filesets[name] = {}
+            if fs and "depend" in fs:
+                filesets[name]["depend"] = copy.deepcopy(fs["depend"])
+        if filesets:
+            header["filesets"] = filesets
+
+        return header
+
+    def _setup_filesets(self, flags):
         fs = copy.deepcopy(self.get("filesets"))
 
         if fs:
@@ -158,23 +216,26 @@ class CoreData:
 
         return fs or {}
 
+    def get_filesets(self, flags):
+        return self._memoize("filesets", flags, lambda: self._setup_filesets(flags))
+
     def get_generate(self, flags):
-        return self._deepcopy_and_expand("generate", flags) or {}
+        return self._expanded("generate", flags, {})
 
     def get_generators(self, flags):
-        return self._deepcopy_and_expand("generators", flags) or {}
+        return self._expanded("generators", flags, {})
 
     def get_scripts(self, flags):
-        return self._deepcopy_and_expand("scripts", flags) or {}
+        return self._expanded("scripts", flags, {})
 
     def get_targets(self, flags):
-        return self._deepcopy_and_expand("targets", flags) or {}
+        return self._expanded("targets", flags, {})
 
     def get_parameters(self, flags):
-        return self._deepcopy_and_expand("parameters", flags) or {}
+        return self._expanded("parameters", flags, {})
 
     def get_vpi(self, flags):
-        return self._deepcopy_and_expand("vpi", flags) or {}
+        return self._expanded("vpi", flags, {})
 
     def get_virtual(self, flags):
-        return self._deepcopy_and_expand("virtual", flags) or []
+        return self._expanded("virtual", flags, [])
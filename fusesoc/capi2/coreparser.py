@@ -8,7 +8,9 @@ from fusesoc.parser.coreparser import CoreParser
 
 
 class Core2Parser(CoreParser):
-    def __init__(self, resolve_env_vars=False, allow_additional_properties=False):
+    def __init__(
+        self, resolve_env_vars=False, allow_additional_properties=False, cache_root=None
+    ):
         self.capi_version = 2
         self.preamble = "CAPI=2:"
         self.schema = capi2_schema
@@ -20,4 +22,5 @@ class Core2Parser(CoreParser):
             self.capi_version,
             resolve_env_vars,
             allow_additional_properties,
+            cache_root,
         )
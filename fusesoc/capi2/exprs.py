@@ -29,16 +29,15 @@ containing each word that matched.
 
 """
 
-from pyparsing import (
-    Forward,
-    Group,
-    OneOrMore,
-    Optional,
-    ParseException,
-    Suppress,
-    Word,
-    alphanums,
-)
+import atexit
+import logging
+import string as _string
+import sys
+from collections import OrderedDict
+
+from fusesoc import utils
+
+logger = logging.getLogger(__name__)
 
 
 def _cond_parse_action(string, location, tokens):
@@ -56,6 +55,9 @@ def _cond_parse_action(string, location, tokens):
 
 _PARSER = None
 
+_WORD_CHARS = _string.ascii_letters + _string.digits + '`:<>.[]_-,=~/^+"$'
+_WHITESPACE = " \t\n\r"
+
 
 def _get_parser():
     """Return a pyparsing parser for the exprs syntax
@@ -75,7 +77,9 @@ def _get_parser():
     if _PARSER is not None:
         return _PARSER
 
-    word = Word(alphanums + '`:<>.[]_-,=~/^+"$')
+    from pyparsing import Forward, Group, OneOrMore, Optional, Suppress, Word
+
+    word = Word(_WORD_CHARS)
     exprs = Forward()
 
     conditional = (
@@ -131,12 +135,17 @@ def _simplify_ast(raw_ast):
     return children
 
 
-def _parse(string):
-    """Parse a string to a simplified AST.
+def _pyparsing_parse(string):
+    """Parse a string to a simplified AST using pyparsing
+
+    This is the reference implementation of the exprs grammar. It is much
+    slower than _parse, which should be used instead.
 
     Raises a ValueError if the string is malformed in some way.
 
     """
+    from pyparsing import ParseException
+
     try:
         raw_ast = _get_parser().parse_string(string, parse_all=True)
     except ParseException as err:
@@ -147,11 +156,221 @@ def _parse(string):
     return _simplify_ast(raw_ast)
 
 
+class _Parser:
+    """A recursive descent parser for the exprs grammar
+
+    This produces the same simplified AST as _simplify_ast(_get_parser()...)
+    in a single pass over the string.
+
+    """
+
+    def __init__(self, string):
+        self.string = string
+        self.pos = 0
+
+    def _error(self, expected):
+        if self.pos < len(self.string):
+            found = repr(self.string[self.pos])
+        else:
+            found = "end of text"
+        err = "Expected {}, found {}  (at char {}), (line:1, col:{})".format(
+            expected, found, self.pos, self.pos + 1
+        )
+        raise ValueError(
+            f"Invalid syntax for string: {err}. Parsed text was {self.string!r}."
+        )
+
+    def _skip_whitespace(self):
+        string = self.string
+        pos = self.pos
+        while pos < len(string) and string[pos] in _WHITESPACE:
+            pos += 1
+        self.pos = pos
+
+    def _word(self):
+        self._skip_whitespace()
+        string = self.string
+        start = pos = self.pos
+        while pos < len(string) and string[pos] in _WORD_CHARS:
+            pos += 1
+        if pos == start:
+            self._error("W:(word)")
+        self.pos = pos
+        return string[start:pos]
+
+    def _expect(self, char):
+        self._skip_whitespace()
+        if self.string[self.pos : self.pos + 1] != char:
+            self._error(repr(char))
+        self.pos += 1
+
+    def _exprs(self):
+        """Parse one or more exprs, up to a closing parenthesis or the end"""
+        children = []
+        str_acc = []
+        while True:
+            self._skip_whitespace()
+            if self.pos == len(self.string) or self.string[self.pos] == ")":
+                break
+
+            negated = self.string[self.pos] == "!"
+            if negated:
+                self.pos += 1
+            word = self._word()
+
+            self._skip_whitespace()
+            if not negated and self.string[self.pos : self.pos + 1] != "?":
+                str_acc.append(word)
+                continue
+
+            # We have a conditional. Join together any items in str_acc and
+            # add them to children before the conditional.
+            self._expect("?")
+            self._expect("(")
+            exprs = self._exprs()
+            self._expect(")")
+
+            if str_acc:
+                children.append(" ".join(str_acc))
+                str_acc = []
+            children.append((negated, word, exprs))
+
+        if str_acc:
+            children.append(" ".join(str_acc))
+        if not children:
+            self._error("W:(word)")
+        return children
+
+    def parse(self):
+        ast = self._exprs()
+        if self.pos != len(self.string):
+            self._error("end of text")
+        return ast
+
+
+def _parse(string):
+    """Parse a string to a simplified AST.
+
+    Raises a ValueError if the string is malformed in some way.
+
+    """
+    return _Parser(string).parse()
+
+
+# Process-wide LRU cache of simplified ASTs, keyed by the parsed string
+_AST_CACHE = OrderedDict()
+_AST_CACHE_SIZE = 16384
+_AST_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_AST_CACHE_CHANGED = False
+
+# Files the AST cache has been loaded from, and will be saved to at exit
+_AST_CACHE_FILES = set()
+
+
+def _intern_ast(ast):
+    """Intern all strings in a simplified AST"""
+    return [
+        sys.intern(child)
+        if isinstance(child, str)
+        else (child[0], sys.intern(child[1]), _intern_ast(child[2]))
+        for child in ast
+    ]
+
+
+def _cache_ast(string, ast):
+    global _AST_CACHE_CHANGED
+    _AST_CACHE[sys.intern(string)] = ast
+    _AST_CACHE_CHANGED = True
+    while len(_AST_CACHE) > _AST_CACHE_SIZE:
+        _AST_CACHE.popitem(last=False)
+        _AST_CACHE_STATS["evictions"] += 1
+
+
+def _parse_cached(string):
+    """Parse a string to a simplified AST, using the AST cache
+
+    The returned AST is shared between all users of the same string and must
+    not be modified.
+    """
+    ast = _AST_CACHE.get(string)
+    if ast is not None:
+        _AST_CACHE_STATS["hits"] += 1
+        _AST_CACHE.move_to_end(string)
+        return ast
+
+    _AST_CACHE_STATS["misses"] += 1
+    ast = _intern_ast(_parse(string))
+    _cache_ast(string, ast)
+    return ast
+
+
+def ast_cache_stats():
+    """Return statistics for the AST cache as a dict"""
+    return dict(_AST_CACHE_STATS, size=len(_AST_CACHE), maxsize=_AST_CACHE_SIZE)
+
+
+def set_ast_cache_size(size):
+    """Set the maximum number of entries in the AST cache"""
+    global _AST_CACHE_SIZE
+    _AST_CACHE_SIZE = size
+    while len(_AST_CACHE) > _AST_CACHE_SIZE:
+        _AST_CACHE.popitem(last=False)
+        _AST_CACHE_STATS["evictions"] += 1
+
+
+def clear_ast_cache():
+    """Remove all entries from the AST cache and reset the statistics"""
+    global _AST_CACHE_CHANGED
+    _AST_CACHE.clear()
+    _AST_CACHE_CHANGED = False
+    for k in _AST_CACHE_STATS:
+        _AST_CACHE_STATS[k] = 0
+
+
+def load_ast_cache(filepath):
+    """Add the ASTs stored in filepath to the AST cache
+
+    The cache is written back to filepath when the process exits.
+    """
+    if filepath in _AST_CACHE_FILES:
+        return
+    if not _AST_CACHE_FILES:
+        atexit.register(_save_ast_caches)
+    _AST_CACHE_FILES.add(filepath)
+
+    entries = utils.pickle_fread(filepath)
+    if not isinstance(entries, list):
+        return
+    for string, ast in entries:
+        if string not in _AST_CACHE:
+            _AST_CACHE[sys.intern(string)] = _intern_ast(ast)
+            # Entries read from disk are the least recently used ones
+            _AST_CACHE.move_to_end(string, last=False)
+    while len(_AST_CACHE) > _AST_CACHE_SIZE:
+        _AST_CACHE.popitem(last=False)
+
+
+def save_ast_cache(filepath):
+    """Write the AST cache to filepath"""
+    try:
+        utils.pickle_fwrite(filepath, list(_AST_CACHE.items()))
+    except OSError as e:
+        logger.debug(f"Failed to write AST cache {filepath}: {e}")
+
+
+def _save_ast_caches():
+    logger.debug("Exprs AST cache: {}".format(ast_cache_stats()))
+    if not _AST_CACHE_CHANGED:
+        return
+    for filepath in _AST_CACHE_FILES:
+        save_ast_cache(filepath)
+
+
 class Exprs:
     """A parsed list of exprs"""
 
     def __init__(self, string):
-        self.ast = _parse(string)
+        self.ast = _parse_cached(string)
         self.as_string = None
 
         # An extra optimisation for the common case where the whole ast boils
@@ -11,29 +11,85 @@ from fusesoc import utils
 class Inheritance:
     MERGE_OPERATOR = "<<__FUSESOC_MERGE_OVERLOAD__<<"
 
+    _merge_key_candidate = re.compile(r"<<(?=\s*:)")
+
+    def _is_merge_key(capi, pos):
+        """
+        Check if the << at pos is used as a mapping key, i.e. if it is preceded,
+        apart from whitespace, by a newline, the start of a flow mapping or the
+        comma after a flow mapping value with at most one level of nesting
+        """
+        start = pos
+        while start > 0 and capi[start - 1].isspace():
+            start -= 1
+        if "\n" in capi[start:pos]:
+            return True
+        if start == 0:
+            return False
+        if capi[start - 1] == "{":
+            return True
+        if start < 2 or capi[start - 2 : start] != "},":
+            return False
+
+        # Search backwards for the { that opens the flow mapping
+        nested = False
+        for i in range(start - 3, -1, -1):
+            c = capi[i]
+            if c == "{":
+                if not nested:
+                    return True
+                nested = False
+            elif c == "}":
+                if nested:
+                    return False
+                nested = True
+        return False
+
     def yaml_merge_2_fusesoc_merge(capi):
         """
         Replace YAML merge key operator (<<) with FuseSoC merge operator
         """
-        yaml_merge_pattern = (
-            r"((?:\n|{|\{\s*(?:[^{}]*\{[^{}]*\})*[^{}]*\},)\s*)<<(?=\s*:)"
-        )
-        while re.search(yaml_merge_pattern, capi):
-            capi = re.sub(yaml_merge_pattern, r"\1" + Inheritance.MERGE_OPERATOR, capi)
-        return capi
+        if "<<" not in capi:
+            return capi
+
+        parts = []
+        last = 0
+        for m in Inheritance._merge_key_candidate.finditer(capi):
+            if Inheritance._is_merge_key(capi, m.start()):
+                parts.append(capi[last : m.start()])
+                parts.append(Inheritance.MERGE_OPERATOR)
+                last = m.end()
+        parts.append(capi[last:])
+        return "".join(parts)
 
     def elaborate_inheritance(capi):
+        """
+        Merge the parents of all mappings that use the FuseSoC merge operator
+
+        Only the mappings that contain the merge operator, directly or in a
+        nested mapping, are copied. Everything else is returned as is.
+        """
         if not isinstance(capi, dict):
             return capi
 
+        elaborated = None
         for key, value in capi.items():
             if isinstance(value, dict):
-                capi[key] = Inheritance.elaborate_inheritance(copy.deepcopy(value))
+                _value = Inheritance.elaborate_inheritance(value)
+                if _value is not value:
+                    if elaborated is None:
+                        elaborated = dict(capi)
+                    elaborated[key] = _value
+
+        if Inheritance.MERGE_OPERATOR not in capi:
+            return capi if elaborated is None else elaborated
 
-        parent = capi.pop(Inheritance.MERGE_OPERATOR, {})
+        if elaborated is None:
+            elaborated = dict(capi)
+        parent = elaborated.pop(Inheritance.MERGE_OPERATOR)
         if isinstance(parent, dict):
-            capi = utils.merge_dict(parent, capi, concat_list_appends_only=True)
+            return utils.merge_dict(
+                copy.deepcopy(parent), elaborated, concat_list_appends_only=True
+            )
         else:
             raise SyntaxError("Invalid use of inheritance operator")
-
-        return capi
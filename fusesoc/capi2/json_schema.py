@@ -394,6 +394,10 @@ capi2_schema = """
             "version": {
               "type": "string"
             },
+            "sparse": {
+              "description": "Only check out the files that match these patterns, e.g. the directories used by the filesets. The patterns use the same syntax as .gitignore files",
+              "$ref": "#/$defs/string_array"
+            },
             "patches": {
               "$ref": "#/$defs/string_array"
             },
@@ -483,6 +487,10 @@ capi2_schema = """
             "user-agent": {
               "type": "string"
             },
+            "sha256": {
+              "description": "SHA256 checksum of the downloaded file. Downloads with a checksum are verified and shared between cores",
+              "type": "string"
+            },
             "verify_cert": {
               "type": "string"
             },
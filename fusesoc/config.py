@@ -157,6 +157,15 @@ class Config:
         else:
             return val
 
+    def _jobs(self, name):
+        """Get the number of parallel jobs from option name"""
+        jobs = self._arg_or_val(
+            "args_" + name,
+            self._cp.getint(Config.default_section, name, fallback=1),
+        )
+        # 0 means one job per CPU
+        return jobs if jobs > 0 else (os.cpu_count() or 1)
+
     @property
     def filters(self):
         return self._cp.get(
@@ -251,6 +260,108 @@ class Config:
     def allow_additional_properties(self, val):
         self._set_default_section("allow_additional_properties", val)
 
+    @property
+    def parser_cache(self):
+        return self._cp.getboolean(
+            Config.default_section, "parser_cache", fallback=True
+        )
+
+    @parser_cache.setter
+    def parser_cache(self, val):
+        self._set_default_section("parser_cache", val)
+
+    @property
+    def library_index(self):
+        return self._cp.getboolean(
+            Config.default_section, "library_index", fallback=True
+        )
+
+    @library_index.setter
+    def library_index(self, val):
+        self._set_default_section("library_index", val)
+
+    @property
+    def solver_cache(self):
+        return self._cp.getboolean(
+            Config.default_section, "solver_cache", fallback=True
+        )
+
+    @solver_cache.setter
+    def solver_cache(self, val):
+        self._set_default_section("solver_cache", val)
+
+    @property
+    def run_fingerprint(self):
+        return self._cp.getboolean(
+            Config.default_section, "run_fingerprint", fallback=True
+        )
+
+    @run_fingerprint.setter
+    def run_fingerprint(self, val):
+        self._set_default_section("run_fingerprint", val)
+
+    @property
+    def lazy_cores(self):
+        return self._cp.getboolean(Config.default_section, "lazy_cores", fallback=False)
+
+    @lazy_cores.setter
+    def lazy_cores(self, val):
+        self._set_default_section("lazy_cores", val)
+
+    @property
+    def parse_jobs(self):
+        return self._jobs("parse_jobs")
+
+    @parse_jobs.setter
+    def parse_jobs(self, val):
+        self._set_default_section("parse_jobs", val)
+
+    @property
+    def fetch_jobs(self):
+        return self._jobs("fetch_jobs")
+
+    @fetch_jobs.setter
+    def fetch_jobs(self, val):
+        self._set_default_section("fetch_jobs", val)
+
+    @property
+    def library_jobs(self):
+        return self._jobs("library_jobs")
+
+    @library_jobs.setter
+    def library_jobs(self, val):
+        self._set_default_section("library_jobs", val)
+
+    @property
+    def generator_jobs(self):
+        return self._jobs("generator_jobs")
+
+    @generator_jobs.setter
+    def generator_jobs(self, val):
+        self._set_default_section("generator_jobs", val)
+
+    @property
+    def generator_cache_max_size(self):
+        # In MiB, 0 means no limit
+        return self._cp.getint(
+            Config.default_section, "generator_cache_max_size", fallback=0
+        )
+
+    @generator_cache_max_size.setter
+    def generator_cache_max_size(self, val):
+        self._set_default_section("generator_cache_max_size", val)
+
+    @property
+    def generator_cache_max_age(self):
+        # In days since the output was last used, 0 means no limit
+        return self._cp.getint(
+            Config.default_section, "generator_cache_max_age", fallback=0
+        )
+
+    @generator_cache_max_age.setter
+    def generator_cache_max_age(self, val):
+        self._set_default_section("generator_cache_max_age", val)
+
     @property
     def verbose(self):
         # Runtime config only, not possible to set in config file
@@ -267,6 +378,28 @@ class Config:
     def no_export(self, val):
         self._set_default_section("no_export", val)
 
+    @property
+    def export_mode(self):
+        return self._arg_or_val(
+            "args_export_mode",
+            self._cp.get(Config.default_section, "export_mode", fallback="copy"),
+        )
+
+    @export_mode.setter
+    def export_mode(self, val):
+        self._set_default_section("export_mode", val)
+
+    @property
+    def edam_format(self):
+        return self._arg_or_val(
+            "args_edam_format",
+            self._cp.get(Config.default_section, "edam_format", fallback="yaml"),
+        )
+
+    @edam_format.setter
+    def edam_format(self, val):
+        self._set_default_section("edam_format", val)
+
     @property
     def system_name(self):
         return self._arg_or_val(
@@ -2,9 +2,13 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import hashlib
 import logging
 import os
 import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from itertools import chain
 from types import MappingProxyType
 from typing import Iterable, Mapping
@@ -17,14 +21,52 @@ from simplesat.pool import Pool
 from simplesat.repository import Repository
 from simplesat.request import Request
 
+from fusesoc import utils
+from fusesoc.capi2.coredata import CoreData
 from fusesoc.capi2.coreparser import Core2Parser
 from fusesoc.core import Core
+from fusesoc.digest import is_racy, stat_key
+from fusesoc.libraryindex import LibraryIndex
 from fusesoc.librarymanager import LibraryManager
 from fusesoc.lockfile import LockFile, LockFileMode
 from fusesoc.vlnv import Vlnv, compare_relation
 
 logger = logging.getLogger(__name__)
 
+# Core parser used by parse worker processes
+_worker_parser = None
+
+
+def _init_parse_worker(*parser_args):
+    global _worker_parser
+    _worker_parser = Core2Parser(*parser_args)
+
+
+def _parse_core_file(core_file):
+    """Parse a CAPI2 core file in a worker process
+
+    Returns None for files that are not in CAPI2 format or can not be parsed.
+    These are parsed again by the main process to report errors in order.
+    """
+    try:
+        with open(core_file) as f:
+            if f.readline().split()[:1] != ["CAPI=2:"]:
+                return None
+        return _worker_parser.read(core_file)
+    except Exception:
+        return None
+
+
+class _LogRecorder(logging.Handler):
+    """Record messages of level INFO and above"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
 
 class DependencyError(Exception):
     def __init__(self, value, msg=""):
@@ -38,11 +80,27 @@ class DependencyError(Exception):
 class CoreDB:
     _mapping: Mapping[str, str] = MappingProxyType({})
 
-    def __init__(self):
+    def __init__(self, cache_root=None, cache_key=""):
         self._cores = {}
         self._solver_cache = {}
         self._lockfile = LockFile()
 
+        # Solutions are also stored in cache_root if it is set. cache_key must
+        # identify everything besides the core files that affects the data
+        # the cores provide to the solver, such as the parser options.
+        self._cache_dir = cache_root and os.path.join(cache_root, "solver_cache")
+        self._cache_key = cache_key
+        self._cores_fingerprint = None
+
+        # Packages for the solver, per set of flags and core name. See
+        # _memoized_core_package.
+        self._packages = {}
+        # Package names of the virtual VLNVs provided by each core
+        self._core_virtuals = {}
+        self._conflict_map = None
+        # Indexes of the cores by name. See _get_vln_index.
+        self._vln_index = None
+
     # simplesat doesn't allow ':', '-' or leading '_'
     def _package_name(self, vlnv):
         _name = f"{vlnv.vendor}_{vlnv.library}_{vlnv.name}".lstrip("_")
@@ -78,6 +136,11 @@ class CoreDB:
         self._solver_cache_invalidate_all()
 
         name = str(core.name)
+        for packages in self._packages.values():
+            packages.pop(name, None)
+        self._core_virtuals.pop(name, None)
+        self._conflict_map = None
+        self._vln_index = None
         logger.debug("Adding core " + name)
         if name in self._cores:
             _s = "Replacing {} in {} with the version found in {}"
@@ -88,14 +151,75 @@ class CoreDB:
 
     def find(self, vlnv=None):
         if vlnv:
-            found = self._solve(vlnv, only_matching_vlnv=True)[-1]
+            found = self._find_indexed(vlnv)
+            if found is None:
+                found = self._solve(vlnv, only_matching_vlnv=True)[-1]
         else:
             found = list([core["core"] for core in self._cores.values()])
         return found
 
+    def find_names(self, name):
+        """Return the <vendor>:<library>:<name> of all cores called name
+
+        The comparison ignores case. Virtual VLNVs are not included.
+        """
+        return sorted(self._get_vln_index()[1].get(name.lower(), []))
+
+    def _get_vln_index(self):
+        """Return indexes of the cores by name
+
+        The first index maps <vendor>:<library>:<name> to the cores with that
+        name, sorted by version. The second one maps lowercase names to
+        <vendor>:<library>:<name>. The third one is the set of
+        <vendor>:<library>:<name> of all virtual VLNVs provided by the cores.
+        """
+        if self._vln_index is not None:
+            return self._vln_index
+
+        vlns = {}
+        names = {}
+        virtuals = set()
+        for core_data in self._cores.values():
+            core = core_data["core"]
+            vln = core.name.vln_str()
+            vlns.setdefault(vln, []).append(core)
+            names.setdefault(core.name.name.lower(), set()).add(vln)
+            for virtual in core.get_virtuals():
+                virtuals.add(virtual.vln_str())
+        for cores in vlns.values():
+            cores.sort(
+                key=lambda core: EnpkgVersion.from_string(
+                    self._package_version(core.name)
+                )
+            )
+        self._vln_index = (vlns, names, virtuals)
+        return self._vln_index
+
+    def _find_indexed(self, vlnv):
+        """Find the newest core matching vlnv without running the solver
+
+        Returns None if the solver is needed to find the core, which is the
+        case when vlnv is a virtual VLNV or when no core matches.
+        """
+        vlns, _, virtuals = self._get_vln_index()
+        vln = vlnv.vln_str()
+        if vln in virtuals or vln not in vlns:
+            return None
+
+        self._lockfile_replace(vlnv)
+        for core in reversed(vlns[vln]):
+            if all(
+                compare_relation(core.name, simple.relation, simple)
+                for simple in vlnv.simpleVLNVs()
+            ):
+                return core
+        return None
+
     def load_lockfile(self, filepath: pathlib.Path, disable_store: bool = False):
         mode = LockFileMode.LOAD if disable_store else LockFileMode.STORE
         self._lockfile = LockFile.load(filepath, mode)
+        self._solver_cache_invalidate_all()
+        self._packages = {}
 
     def store_lockfile(self, cores):
         if self._lockfile.update(cores):
@@ -115,6 +239,7 @@ class CoreDB:
 
     def _solver_cache_invalidate_all(self):
         self._solver_cache = {}
+        self._cores_fingerprint = None
 
     def _hash_flags_dict(self, flags):
         """Hash the flags dict.
@@ -243,6 +368,8 @@ class CoreDB:
             mappings.update(new_mapping)
 
         self._mapping = MappingProxyType(mappings)
+        self._solver_cache_invalidate_all()
+        self._packages = {}
 
     def solve(self, top_core, flags):
         return self._solve(top_core, flags)
@@ -256,27 +383,244 @@ class CoreDB:
         VLNVs. In the resulting package definitions, these must get "conflicts"
         constraints.
         """
+        if self._conflict_map is not None:
+            return self._conflict_map
+
         conflict_map = {}
         virtual_map = {}
-        for core_data in self._cores.values():
+        for name, core_data in self._cores.items():
             core = core_data["core"]
-            _virtuals = core.get_virtuals()
-            for virtual in _virtuals:
-                for simple in virtual.simpleVLNVs():
-                    virtual_pkg = self._package_name(simple)
-                    # FIXME: The real package should include version info
-                    real_pkg = self._package_name(core.name)
-                    virtual_set = virtual_map.setdefault(virtual_pkg, set())
-                    virtual_set.add(real_pkg)
+            if name not in self._core_virtuals:
+                self._core_virtuals[name] = [
+                    self._package_name(simple)
+                    for virtual in core.get_virtuals()
+                    for simple in virtual.simpleVLNVs()
+                ]
+            # FIXME: The real package should include version info
+            real_pkg = self._package_name(core.name)
+            for virtual_pkg in self._core_virtuals[name]:
+                virtual_set = virtual_map.setdefault(virtual_pkg, set())
+                virtual_set.add(real_pkg)
         for virtual_pkg, virtual_set in virtual_map.items():
             for real_pkg in virtual_set:
                 conflict_set = conflict_map.setdefault(real_pkg, set())
                 conflict_set |= virtual_set
         for real_pkg, conflict_set in conflict_map.items():
             conflict_set.remove(real_pkg)
+        self._conflict_map = conflict_map
         return conflict_map
 
     def _solve(self, top_core, flags={}, only_matching_vlnv=False):
+        # Try to return a cached result. Vlnv objects that only differ in the
+        # relation compare equal, so the relation is part of the key.
+        solver_cache_key = (
+            top_core,
+            top_core.relation,
+            self._hash_flags_dict(flags),
+            only_matching_vlnv,
+        )
+        cached_solution = self._solver_cache_lookup(solver_cache_key)
+        if cached_solution:
+            return cached_solution
+
+        persistent_key = self._persistent_solver_cache_key(
+            top_core, flags, only_matching_vlnv
+        )
+        if persistent_key:
+            result = self._persistent_solver_cache_load(persistent_key)
+            if result is not None:
+                logger.debug(f"Solver cache hit for {top_core}")
+                self._solver_cache_store(solver_cache_key, result)
+                return result
+            logger.debug(f"Solver cache miss for {top_core}")
+
+        # Record the messages logged while solving, so that they can be
+        # repeated when the solution is taken from the persistent cache.
+        recorder = _LogRecorder()
+        logger.addHandler(recorder)
+        try:
+            result = self._run_solver(top_core, flags, only_matching_vlnv)
+        finally:
+            logger.removeHandler(recorder)
+
+        if persistent_key:
+            self._persistent_solver_cache_store(
+                persistent_key, result, recorder.records
+            )
+
+        # Cache the solution for further lookups
+        self._solver_cache_store(solver_cache_key, result)
+
+        return result
+
+    def _persistent_solver_cache_key(self, top_core, flags, only_matching_vlnv):
+        """Return a key identifying everything that the solution depends on
+
+        Returns None if the persistent solver cache is disabled or if any of
+        the core files has been modified too recently to be trusted.
+        """
+        if not self._cache_dir:
+            return None
+
+        if self._cores_fingerprint is None:
+            now = time.time()
+            fingerprint = []
+            for name, core_data in self._cores.items():
+                core_file = core_data["core"].core_file
+                try:
+                    st = os.stat(core_file)
+                except OSError:
+                    return None
+                if is_racy(st, now):
+                    return None
+                fingerprint.append((name, core_file, stat_key(st)))
+            self._cores_fingerprint = fingerprint
+
+        key = [
+            self._cache_key,
+            top_core.relation,
+            str(top_core),
+            sorted((k, str(v)) for k, v in flags.items()),
+            only_matching_vlnv,
+            sorted(self._mapping.items()),
+            sorted(str(vlnv) for vlnv in self._lockfile.cores_vlnv()),
+            self._cores_fingerprint,
+        ]
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def _persistent_solver_cache_load(self, key):
+        entry = utils.pickle_fread(os.path.join(self._cache_dir, key))
+        if not entry:
+            return None
+        try:
+            result = [self._cores[name]["core"] for name in entry["cores"]]
+        except KeyError:
+            return None
+        for name, direct_deps in entry["direct_deps"].items():
+            self._cores[name]["core"].direct_deps = list(direct_deps)
+        for level, msg in entry["log"]:
+            logger.log(level, msg)
+        return result
+
+    def _persistent_solver_cache_store(self, key, result, log):
+        # The solver only sets direct_deps if there is more than one core
+        entry = {
+            "cores": [str(core.name) for core in result],
+            "direct_deps": {
+                str(core.name): core.direct_deps for core in result if len(result) > 1
+            },
+            "log": log,
+        }
+        try:
+            utils.pickle_fwrite(os.path.join(self._cache_dir, key), entry)
+        except OSError as e:
+            logger.debug(f"Failed to write solver cache entry: {e}")
+
+    def _core_package(self, core, flags, conflict_map, with_depends=False):
+        """Create a simplesat package for a core"""
+        # Build a "pretty" package string in a format expected by
+        # PrettyPackageStringParser()
+        package_str = "{} {}-{}".format(
+            self._package_name(core.name),
+            core.name.version,
+            core.name.revision,
+        )
+
+        _virtuals = core.get_virtuals(flags)
+        if _virtuals:
+            _s = "; provides ( {} )"
+            package_str += _s.format(self._parse_virtual(_virtuals))
+        conflict_set = conflict_map.get(self._package_name(core.name), set())
+        if len(conflict_set) > 0:
+            _s = "; conflicts ( {} )"
+            package_str += _s.format(", ".join(sorted(conflict_set)))
+
+        # Add dependencies only if we want to build the whole dependency
+        # tree.
+        if with_depends:
+            try:
+                _depends = core.get_depends(flags)
+            except SyntaxError as e:
+                logger.warning(
+                    f"Ignoring {core.name} due to syntax error in dependencies: {e.msg}"
+                )
+                _depends = []
+            if _depends:
+                for depend in _depends:
+                    self._mapping_apply(depend)
+                    self._lockfile_replace(depend)
+                _s = "; depends ( {} )"
+                package_str += _s.format(self._parse_depend(_depends))
+
+        parser = PrettyPackageStringParser(EnpkgVersion.from_string)
+
+        package = parser.parse_to_package(package_str)
+        package.core = core
+        return package
+
+    def _memoized_core_package(self, core, flags, conflict_map):
+        """Return a package with dependencies for a core, reusing earlier ones
+
+        Packages are kept per set of flags until the core is replaced or the
+        conflicts of the core change. Mappings and lock files also affect the
+        dependencies, so all packages are dropped when those change.
+        """
+        name = str(core.name)
+        conflict_set = frozenset(conflict_map.get(self._package_name(core.name), set()))
+        try:
+            packages = self._packages.setdefault(frozenset(flags.items()), {})
+        except TypeError:
+            # Flags that can not be hashed
+            return self._core_package(core, flags, conflict_map, True)
+
+        memo = packages.get(name)
+        if memo and memo[0] == conflict_set:
+            return memo[1]
+        package = self._core_package(core, flags, conflict_map, True)
+        packages[name] = (conflict_set, package)
+        return package
+
+    def _reachable_packages(self, cores, flags, top_core, conflict_map):
+        """Return packages for the cores that can be reached from top_core
+
+        Cores are reachable if they provide the top core, or a package that is
+        required by a reachable core. Dependencies are only looked up for the
+        reachable cores. The order of the cores is kept.
+        """
+        core_flags = {}
+        providers = {}
+        for core in cores:
+            _flags = flags.copy()
+            _flags["is_toplevel"] = core.name == top_core
+            core_flags[id(core)] = _flags
+            provided = [self._package_name(core.name)]
+            provided += [
+                self._package_name(simple)
+                for virtual in core.get_virtuals(_flags)
+                for simple in virtual.simpleVLNVs()
+            ]
+            for name in provided:
+                providers.setdefault(name, []).append(core)
+
+        packages = {}
+        seen = set()
+        todo = [self._package_name(top_core)]
+        while todo:
+            name = todo.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            for core in providers.get(name, []):
+                if id(core) in packages:
+                    continue
+                package = self._memoized_core_package(
+                    core, core_flags[id(core)], conflict_map
+                )
+                packages[id(core)] = package
+                todo += [required for required, _ in package.install_requires]
+        return [packages[id(core)] for core in cores if id(core) in packages]
+
+    def _run_solver(self, top_core, flags, only_matching_vlnv):
         def eq_vln(this, that):
             return (
                 this.vendor == that.vendor
@@ -284,69 +628,27 @@ class CoreDB:
                 and this.name == that.name
             )
 
-        # Try to return a cached result
-        solver_cache_key = (top_core, self._hash_flags_dict(flags), only_matching_vlnv)
-        cached_solution = self._solver_cache_lookup(solver_cache_key)
-        if cached_solution:
-            return cached_solution
-
         repo = Repository()
-        _flags = flags.copy()
         cores = [x["core"] for x in self._cores.values()]
         conflict_map = self._get_conflict_map()
 
-        for core in cores:
-            if only_matching_vlnv:
+        if only_matching_vlnv:
+            packages = []
+            for core in cores:
                 if not any(
                     [eq_vln(core.name, top_core)]
                     + [
                         eq_vln(virtual_vlnv, top_core)
-                        for virtual_vlnv in core.get_virtuals(_flags)
+                        for virtual_vlnv in core.get_virtuals(flags)
                     ]
                 ):
                     continue
-
-            # Build a "pretty" package string in a format expected by
-            # PrettyPackageStringParser()
-            package_str = "{} {}-{}".format(
-                self._package_name(core.name),
-                core.name.version,
-                core.name.revision,
-            )
-
-            _virtuals = core.get_virtuals(_flags)
-            if _virtuals:
-                _s = "; provides ( {} )"
-                package_str += _s.format(self._parse_virtual(_virtuals))
-            conflict_set = conflict_map.get(self._package_name(core.name), set())
-            if len(conflict_set) > 0:
-                _s = "; conflicts ( {} )"
-                package_str += _s.format(", ".join(list(conflict_set)))
-
-            # Add dependencies only if we want to build the whole dependency
-            # tree.
-            if not only_matching_vlnv:
-                _flags["is_toplevel"] = core.name == top_core
-                try:
-                    _depends = core.get_depends(_flags)
-                except SyntaxError as e:
-                    logger.warning(
-                        f"Ignoring {core.name} due to syntax error in dependencies: {e.msg}"
-                    )
-                if _depends:
-                    for depend in _depends:
-                        self._mapping_apply(depend)
-                        self._lockfile_replace(depend)
-                    _s = "; depends ( {} )"
-                    package_str += _s.format(self._parse_depend(_depends))
-            else:
                 self._lockfile_replace(top_core)
+                packages.append(self._core_package(core, flags, conflict_map))
+        else:
+            packages = self._reachable_packages(cores, flags, top_core, conflict_map)
 
-            parser = PrettyPackageStringParser(EnpkgVersion.from_string)
-
-            package = parser.parse_to_package(package_str)
-            package.core = core
-
+        for package in packages:
             repo.add_package(package)
 
         request = Request()
@@ -375,7 +677,9 @@ class CoreDB:
         if len(transaction.operations) > 1:
             for op in transaction.operations:
                 package_name = self._package_name(op.package.core.name)
-                virtuals = op.package.core.get_virtuals(_flags)
+                virtuals = op.package.core.get_virtuals(
+                    dict(flags, is_toplevel=op.package.core.name == top_core)
+                )
                 for p in op.package.provides:
                     for virtual in virtuals:
                         if p[0] == self._package_name(virtual):
@@ -404,94 +708,148 @@ class CoreDB:
         if partial_lockfile and not self._lockfile.no_cores():
             logger.warning("Using lock file with partial list of cores")
 
-        result = [op.package.core for op in transaction.operations]
-
-        # Cache the solution for further lookups
-        self._solver_cache_store(solver_cache_key, result)
-
-        return result
+        return [op.package.core for op in transaction.operations]
 
 
 class CoreManager:
     def __init__(self, config, library_manager=None):
         self.config = config
-        self.db = CoreDB()
         self._lm = (
             LibraryManager(config.library_root)
             if library_manager is None
             else library_manager
         )
-        self.core2parser = Core2Parser(
-            config.resolve_env_vars_early, config.allow_additional_properties
+        self._parser_args = (
+            config.resolve_env_vars_early,
+            config.allow_additional_properties,
+            config.cache_root if config.parser_cache else None,
         )
+        self.core2parser = Core2Parser(*self._parser_args)
+
+        # Core files can not be fingerprinted by their stat info if they
+        # depend on environment variables
+        if config.solver_cache and not config.resolve_env_vars_early:
+            self.db = CoreDB(config.cache_root, self.core2parser.get_cache_key())
+        else:
+            self.db = CoreDB()
+
+    def _library_index(self, library):
+        path = os.path.expanduser(library.location)
+        cache_root = self.config.cache_root if self.config.library_index else None
+        return LibraryIndex(path, cache_root)
 
     def find_cores(self, library, ignored_dirs):
         found_cores = []
         path = os.path.expanduser(library.location)
-        exclude = {".git"}
         if not os.path.isdir(path):
             raise OSError(path + " is not a directory")
         logger.debug("Checking for cores in " + path)
-        visited = set()
-        for root, dirs, files in os.walk(path, followlinks=True):
-            ignore_tree = ("FUSESOC_IGNORE" in files) or (
-                os.path.realpath(root) in ignored_dirs
-            )
-            if ignore_tree:
-                del dirs[:]
-                continue
-
-            keep_dirs = []
-            for _d in dirs:
-                # Ignore sub dirs in the exclude set
-                if _d in exclude:
+        index = self._library_index(library)
+        core_files = index.find_core_files(ignored_dirs)
+
+        headers = {}
+        if self.config.lazy_cores:
+            # Headers depend on the environment if variables are resolved
+            # while parsing, so only keep them in the index otherwise.
+            if self.config.resolve_env_vars_early:
+                header_key = None
+            else:
+                header_key = self.core2parser.get_cache_key()
+            for core_file in core_files:
+                header = index.get_header(core_file, header_key)
+                if header is not None:
+                    headers[core_file] = header
+
+        parsed = self._parse_core_files([f for f in core_files if f not in headers])
+        for core_file in core_files:
+            try:
+                capi_version = self._detect_capi_version(core_file)
+                if capi_version == 1:
+                    # Skip core files which are not in CAPI2 format.
+                    logger.error(
+                        "Core file {} is in CAPI1 format, which is not supported "
+                        "any more since FuseSoC 2.0. The core file is ignored. "
+                        "Please migrate your cores to the CAPI2 file format, or "
+                        "use FuseSoC 1.x as stop-gap.".format(core_file)
+                    )
                     continue
-
-                st = os.stat(os.path.join(root, _d))
-                dirkey = st.st_dev, st.st_ino
-                # Ignore dirs we already visited. Protects against endless symlink recursion
-                if dirkey in visited:
+                elif capi_version == -1:
+                    # Skip core files which are not FuseSoc format at all.
                     continue
 
-                visited.add(dirkey)
-                keep_dirs.append(_d)
-
-            dirs[:] = keep_dirs
-
-            for f in files:
-                if f.endswith(".core"):
-                    core_file = os.path.join(root, f)
-                    try:
-                        capi_version = self._detect_capi_version(core_file)
-                        if capi_version == 1:
-                            # Skip core files which are not in CAPI2 format.
-                            logger.error(
-                                "Core file {} is in CAPI1 format, which is not supported "
-                                "any more since FuseSoC 2.0. The core file is ignored. "
-                                "Please migrate your cores to the CAPI2 file format, or "
-                                "use FuseSoC 1.x as stop-gap.".format(core_file)
-                            )
-                            continue
-                        elif capi_version == -1:
-                            # Skip core files which are not FuseSoc format at all.
-                            continue
-
-                        core = Core(
-                            parser=self.core2parser,
-                            core_file=core_file,
-                            cache_root=self.config.cache_root,
-                        )
-                        found_cores.append(core)
-                    except SyntaxError as e:
-                        w = "Parse error. Ignoring file " + core_file + ": " + e.msg
-                        logger.warning(w)
-                    except ImportError as e:
-                        w = 'Failed to register "{}" due to unknown provider: {}'
-                        logger.warning(w.format(core_file, str(e)))
-                    except ValueError as e:
-                        logger.warning(e)
+                capi_data = parsed.get(core_file)
+                header = headers.get(core_file)
+                if self.config.lazy_cores and header is None:
+                    st = os.stat(core_file)
+                    if capi_data is None:
+                        capi_data = self.core2parser.read(core_file)
+                    header = CoreData(capi_data).get_header()
+                    capi_data = None
+                    if header_key:
+                        index.set_header(core_file, header_key, st, header)
+
+                core = Core(
+                    parser=self.core2parser,
+                    core_file=core_file,
+                    cache_root=self.config.cache_root,
+                    capi_data=capi_data,
+                    header=header,
+                )
+                found_cores.append(core)
+            except SyntaxError as e:
+                w = "Parse error. Ignoring file " + core_file + ": " + e.msg
+                logger.warning(w)
+            except ImportError as e:
+                w = 'Failed to register "{}" due to unknown provider: {}'
+                logger.warning(w.format(core_file, str(e)))
+            except ValueError as e:
+                logger.warning(e)
+        index.save()
         return found_cores
 
+    def _parse_core_files(self, core_files):
+        """Parse core files in parallel if parse_jobs is larger than one
+
+        Returns a dict with the parsed contents of the core files that are
+        cached or could be parsed by the worker processes. Remaining files are
+        left to Core to parse, so that errors and warnings are reported in the
+        same order as when parsing serially.
+        """
+        jobs = self.config.parse_jobs
+        if jobs < 2:
+            return {}
+
+        parsed = {}
+        to_parse = []
+        for core_file in core_files:
+            capi_data = self.core2parser.read_cached(core_file)
+            if capi_data is None:
+                to_parse.append(core_file)
+            else:
+                parsed[core_file] = capi_data
+        if len(to_parse) < 2:
+            return parsed
+
+        jobs = min(jobs, len(to_parse))
+        logger.debug(f"Parsing {len(to_parse)} core files using {jobs} processes")
+        try:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_parse_worker,
+                initargs=self._parser_args,
+            ) as executor:
+                results = executor.map(
+                    _parse_core_file,
+                    to_parse,
+                    chunksize=max(1, len(to_parse) // (jobs * 4)),
+                )
+                for core_file, capi_data in zip(to_parse, results):
+                    if capi_data is not None:
+                        parsed[core_file] = capi_data
+        except (OSError, BrokenProcessPool) as e:
+            logger.debug(f"Parallel parsing failed, falling back to serial: {e}")
+        return parsed
+
     def _detect_capi_version(self, core_file) -> int:
         """Detect the CAPI version in a .core file
 
@@ -551,6 +909,15 @@ class CoreManager:
         """Get all registered libraries"""
         return self._lm.get_libraries()
 
+    def reindex_library(self, library, ignored_dirs):
+        """Rebuild the persistent index of a library from scratch"""
+        path = os.path.expanduser(library.location)
+        if not os.path.isdir(path):
+            raise OSError(path + " is not a directory")
+        index = self._library_index(library)
+        index.remove()
+        return index.find_core_files(ignored_dirs, rescan=True)
+
     def get_depends(self, core, flags):
         """Get an ordered list of all dependencies of a core
 
@@ -576,6 +943,10 @@ class CoreManager:
         """Get a dict with all cores, indexed by the core name"""
         return {str(x.name): x for x in self.db.find()}
 
+    def find_core_names(self, name):
+        """Get the <vendor>:<library>:<name> of all cores called name"""
+        return self.db.find_names(name)
+
     def get_core(self, name):
         """Get a core with a given name"""
         c = self.db.find(name)
@@ -0,0 +1,98 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import hashlib
+import logging
+import os
+import time
+
+from fusesoc import utils
+
+logger = logging.getLogger(__name__)
+
+# Files modified less than this many seconds ago are not trusted to be
+# unchanged just because their stat info matches, since a second modification
+# might happen within the timestamp granularity.
+_RACY_INTERVAL = 2
+
+_CHUNK_SIZE = 1 << 20
+
+
+def stat_key(st):
+    """Return the parts of an os.stat_result used to detect file changes"""
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def is_racy(st, now=None):
+    """Return True if the file was modified too recently for its stat_key to
+    detect further changes. now defaults to the current time."""
+    if now is None:
+        now = time.time()
+    return now - st.st_mtime < _RACY_INTERVAL
+
+
+def sha256_file(filepath):
+    """Return the SHA256 hex digest of a file, read in chunks"""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DigestCache:
+    """Persistent cache of the SHA256 digests of files
+
+    Digests are looked up by the absolute path and the stat info (mtime, size
+    and inode) of the file, so files that have not changed since they were
+    last hashed are not read again. Without a cache_root, the digests are only
+    kept in memory.
+    """
+
+    def __init__(self, cache_root=None):
+        if cache_root:
+            self.cache_dir = os.path.join(cache_root, "digest_cache")
+        else:
+            self.cache_dir = None
+        self._digests = {}
+
+    def _entry_path(self, filepath):
+        name = hashlib.sha256(filepath.encode()).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def sha256(self, filepath):
+        """Return the SHA256 hex digest of filepath
+
+        Raises OSError if the file can not be read.
+        """
+        filepath = os.path.abspath(filepath)
+        st = os.stat(filepath)
+        key = stat_key(st)
+
+        memo = self._digests.get(filepath)
+        if memo and memo[0] == key:
+            return memo[1]
+
+        if self.cache_dir:
+            entry = utils.pickle_fread(self._entry_path(filepath))
+            if entry and entry["stat"] == key:
+                self._digests[filepath] = (key, entry["sha256"])
+                return entry["sha256"]
+
+        digest = sha256_file(filepath)
+        if stat_key(os.stat(filepath)) != key:
+            # Modified while it was being read. Don't remember the digest.
+            return digest
+        if is_racy(st):
+            return digest
+
+        self._digests[filepath] = (key, digest)
+        if self.cache_dir:
+            try:
+                utils.pickle_fwrite(
+                    self._entry_path(filepath), {"stat": key, "sha256": digest}
+                )
+            except OSError as e:
+                logger.debug(f"Failed to write digest cache entry for {filepath}: {e}")
+        return digest
@@ -4,21 +4,27 @@
 
 import argparse
 import hashlib
+import json
 import logging
 import os
 import pathlib
 import shutil
-from filecmp import cmp
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from importlib import import_module
 
 from fusesoc import utils
 from fusesoc.capi2.coreparser import Core2Parser
 from fusesoc.core import Core
-from fusesoc.utils import Launcher, merge_dict
+from fusesoc.digest import DigestCache
+from fusesoc.export import export_file
+from fusesoc.generatorcache import GeneratorCache
+from fusesoc.utils import Launcher, merge_dict, merge_dict_inplace
 from fusesoc.vlnv import Vlnv
 
 logger = logging.getLogger(__name__)
 
+EDAM_FORMATS = ["yaml", "json"]
+
 
 class FileAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
@@ -49,6 +55,7 @@ class Edalizer:
         export_root=None,
         system_name=None,
         resolve_env_vars=False,
+        export_mode="copy",
     ):
         logger.debug("Building EDAM structure")
 
@@ -59,8 +66,13 @@ class Edalizer:
         self.export_root = export_root
         self.system_name = system_name
         self.resolve_env_vars = resolve_env_vars
+        self.export_mode = export_mode
 
         self.generators = {}
+        self._export_manifests = []
+        self._copied_files = []
+        self._run_ttptttgs = []
+        self._unfingerprinted_inputs = False
 
         self._resolved_or_generated_cores = []
 
@@ -130,10 +142,60 @@ class Edalizer:
         return core_flags
 
     def setup_cores(self):
-        """Setup cores: fetch resources, patch them, etc."""
-        for core in self.cores:
-            logger.info("Preparing " + str(core.name))
-            core.setup()
+        """Setup cores: fetch resources, patch them, etc.
+
+        Up to fetch_jobs cores are set up in parallel. Cores that share the
+        same files_root are set up one after another by the same job, in the
+        order of the dependency tree. Each core is reported as it finishes.
+        Errors are reported in the order of the dependency tree, regardless
+        of which job finishes first.
+        """
+        cores = self.cores
+        groups = {}
+        for core in cores:
+            if core.provider:
+                files_root = os.path.realpath(core.files_root)
+                groups.setdefault(files_root, []).append(core)
+
+        jobs = self.core_manager.config.fetch_jobs
+        if jobs == 1 or len(groups) < 2:
+            for core in cores:
+                logger.info("Preparing " + str(core.name))
+                core.setup()
+            return
+
+        def setup_group(group):
+            done = []
+            for core in group:
+                try:
+                    core.setup()
+                except Exception as e:
+                    # Later cores in the group may depend on the same files
+                    return done, [(core, e)]
+                done.append(core)
+            return done, []
+
+        for core in cores:
+            if not core.provider:
+                logger.info("Preparing " + str(core.name))
+
+        total = sum(len(group) for group in groups.values())
+        finished = 0
+        errors = []
+        with ThreadPoolExecutor(min(jobs, len(groups))) as executor:
+            futures = [executor.submit(setup_group, g) for g in groups.values()]
+            for future in as_completed(futures):
+                done, group_errors = future.result()
+                for core in done:
+                    finished += 1
+                    logger.info(f"Prepared {core.name} ({finished}/{total})")
+                errors += group_errors
+        errors.sort(key=lambda x: cores.index(x[0]))
+
+        for core, e in errors[1:]:
+            logger.error(f"Failed to prepare {core.name}: {e}")
+        if errors:
+            raise errors[0][1]
 
     def extract_generators(self):
         """Get all registered generators from the cores"""
@@ -148,12 +210,55 @@ class Edalizer:
         self.generators = generators
 
     def run_generators(self):
-        """Run all generators"""
+        """Run all generators
+
+        Up to generator_jobs generators are run in parallel. Generators that
+        share the same working directory are run one after another by the
+        same job. The generated cores are added in the same order, and the
+        same errors are reported, as when the generators run one at a time.
+        """
         self._resolved_or_generated_cores = []
-        for core in self.cores:
+        cores = self.cores
+        ttptttgs = self._ttptttgs(cores)
+        self._run_ttptttgs = [_ttptttg for _, _ttptttg in ttptttgs]
+
+        gen_cores = self._generate(self._run_ttptttgs)
+        # Generators that are not cached by their input may produce
+        # different output every time they run
+        if not all(_ttptttg.is_input_cacheable() for _, _ttptttg in ttptttgs):
+            self._unfingerprinted_inputs = True
+        has_generators = bool(ttptttgs)
+        used_keys = {
+            os.path.basename(_ttptttg.generator_cwd()) for _, _ttptttg in ttptttgs
+        }
+
+        for core in cores:
+            self._resolved_or_generated_cores.append(core)
+            while ttptttgs and ttptttgs[0][0] is core:
+                _, _ttptttg = ttptttgs.pop(0)
+                for gen_core in gen_cores.pop(0):
+                    core.direct_deps.append(str(gen_core.name))
+                    gen_core.pos = _ttptttg.pos
+                    self._resolved_or_generated_cores.append(gen_core)
+
+        config = self.core_manager.config
+        if has_generators and (
+            config.generator_cache_max_size or config.generator_cache_max_age
+        ):
+            cache = GeneratorCache(os.path.join(config.cache_root, "generator_cache"))
+            # Never remove the output that this build refers to
+            cache.evict(
+                max_size=config.generator_cache_max_size * 2**20,
+                max_age=config.generator_cache_max_age * 24 * 60 * 60,
+                keep=used_keys,
+            )
+
+    def _ttptttgs(self, cores):
+        """Return (core, Ttptttg) for each generator instance in cores"""
+        ttptttgs = []
+        for core in cores:
             logger.debug("Running generators in " + str(core.name))
             core_flags = self._core_flags(core)
-            self._resolved_or_generated_cores.append(core)
             for ttptttg_data in core.get_ttptttg(core_flags):
                 _ttptttg = Ttptttg(
                     ttptttg_data,
@@ -162,18 +267,59 @@ class Edalizer:
                     self.work_root,
                     resolve_env_vars=self.resolve_env_vars,
                 )
+                ttptttgs.append((core, _ttptttg))
+        return ttptttgs
+
+    def generator_cache_keys(self):
+        """Return the cache keys of the generators of the resolved cores
+
+        The generators are not run. The cache keys include the digests of
+        the generator input files, so they change whenever the output of an
+        input cached generator might change.
+        """
+        self.extract_generators()
+        return [
+            _ttptttg.cache_key() for _, _ttptttg in self._ttptttgs(self.resolved_cores)
+        ]
+
+    def _generate(self, ttptttgs):
+        """Run the generators and return the cores created by each of them"""
+
+        def generate(_ttptttg):
+            try:
+                return _ttptttg.generate(), None
+            except RuntimeError as e:
+                return [], e
+
+        jobs = self.core_manager.config.generator_jobs
+        if jobs == 1 or len(ttptttgs) < 2:
+            results = map(generate, ttptttgs)
+        else:
+            groups = {}
+            for _ttptttg in ttptttgs:
                 try:
-                    gen_cores = _ttptttg.generate()
-                except RuntimeError as e:
-                    logger.error(e)
-                    raise RuntimeError(
-                        f"Failed to run generator '{ttptttg_data['name']}'"
-                    )
-                    gen_cores = []
-                for gen_core in gen_cores:
-                    core.direct_deps.append(str(gen_core.name))
-                    gen_core.pos = _ttptttg.pos
-                    self._resolved_or_generated_cores.append(gen_core)
+                    key = os.path.realpath(_ttptttg.generator_cwd())
+                except RuntimeError:
+                    # Reported when the generator is run
+                    key = _ttptttg
+                groups.setdefault(key, []).append(_ttptttg)
+
+            def generate_group(group):
+                return {_ttptttg: generate(_ttptttg) for _ttptttg in group}
+
+            results = {}
+            with ThreadPoolExecutor(min(jobs, len(groups))) as executor:
+                for group_results in executor.map(generate_group, groups.values()):
+                    results.update(group_results)
+            results = [results[_ttptttg] for _ttptttg in ttptttgs]
+
+        gen_cores = []
+        for _ttptttg, (cores, e) in zip(ttptttgs, results):
+            if e:
+                logger.error(e)
+                raise RuntimeError(f"Failed to run generator '{_ttptttg.name}'")
+            gen_cores.append(cores)
+        return gen_cores
 
     def export(self):
         for core in self.cores:
@@ -182,7 +328,8 @@ class Edalizer:
             # Export core files
             if self.export_root:
                 files_root = os.path.join(self.export_root, core.name.sanitized_name)
-                core.export(files_root, _flags)
+                manifest = core.export(files_root, _flags, self.export_mode)
+                self._export_manifests.append(manifest)
             else:
                 files_root = core.files_root
 
@@ -196,15 +343,18 @@ class Edalizer:
         dst = os.path.join(self.work_root, name)
         os.makedirs(os.path.dirname(dst), exist_ok=True)
 
-        if not os.path.exists(dst) or not cmp(src, dst):
-            try:
-                shutil.copy2(src, dst)
-            except IsADirectoryError:
-                shutil.copytree(
-                    src,
-                    dst,
-                    dirs_exist_ok=True,
-                )
+        if os.path.isdir(src):
+            shutil.copytree(
+                src,
+                dst,
+                dirs_exist_ok=True,
+            )
+            self._unfingerprinted_inputs = True
+        else:
+            if os.path.isdir(dst):
+                dst = os.path.join(dst, os.path.basename(src))
+            export_file(src, dst, self.export_mode)
+            self._copied_files.append((os.path.abspath(src), dst))
 
     def create_edam(self):
         first_snippets = []
@@ -318,8 +468,9 @@ class Edalizer:
             "toplevel": top_core.get_toplevel(self.flags),
         }
 
-        for snippet in first_snippets + snippets + last_snippets:
-            merge_dict(self.edam, snippet)
+        for _snippets in [first_snippets, snippets, last_snippets]:
+            for snippet in _snippets:
+                merge_dict_inplace(self.edam, snippet)
 
     def _build_parser(self, backend_class, edam):
         typedict = {
@@ -522,10 +673,55 @@ class Edalizer:
 
         self.add_parsed_args(backend_class, args_dict)
 
+    def fingerprint_files(self):
+        """Get the input and output files of the run
+
+        Returns a tuple with a list of the input files and a list of the
+        output files, or None if the result of the run might change even if
+        none of these files change.
+        """
+        if self._unfingerprinted_inputs:
+            return None
+        for core in self.cores:
+            if core.provider and not core.provider.cachable:
+                return None
+        # Without export, the EDAM refers to fetched and generated files in
+        # the cache, which might be removed without changing any of the files
+        if not self.export_root and (
+            self._run_ttptttgs or any(core.provider for core in self.cores)
+        ):
+            return None
+
+        inputs = [core.core_file for core in self.cores]
+        for _ttptttg in self._run_ttptttgs:
+            inputs += _ttptttg.file_inputs()
+        outputs = []
+        for manifest in self._export_manifests:
+            for rel, entry in manifest.files.items():
+                inputs.append(entry["src"])
+                outputs.append(os.path.join(manifest.dst_dir, rel))
+        for src, dst in self._copied_files:
+            inputs.append(src)
+            outputs.append(dst)
+        return inputs, outputs
+
+    def edam_hash(self):
+        """Return the SHA256 hex digest of the EDAM
+
+        The digest is calculated from a canonical JSON serialization, so it
+        does not depend on the order of the keys or the EDAM file format.
+        """
+        data = json.dumps(self.edam, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
     def to_yaml(self, edam_file):
         pathlib.Path(edam_file).parent.mkdir(parents=True, exist_ok=True)
         return utils.yaml_fwrite(edam_file, self.edam)
 
+    def to_json(self, edam_file):
+        pathlib.Path(edam_file).parent.mkdir(parents=True, exist_ok=True)
+        return utils.json_fwrite(edam_file, self.edam)
+
 
 class Ttptttg:
     def __init__(self, ttptttg, core, generators, work_root, resolve_env_vars=False):
@@ -561,6 +757,7 @@ class Ttptttg:
             "parameters": parameters,
             "vlnv": vlnv_str,
         }
+        self._generator_cwd = None
 
     def _sha256_input_yaml_hexdigest(self):
         data = self.generator_input.copy()
@@ -568,7 +765,10 @@ class Ttptttg:
         data.pop("files_root")
         return hashlib.sha256(utils.yaml_dump(data).encode()).hexdigest()
 
-    def _sha256_file_input_hexdigest(self):
+    def file_inputs(self):
+        """Return the paths of the files named by the file_input_parameters"""
+        if "file_input_parameters" not in self.generator:
+            return []
         input_files = []
         logger.debug(
             "Configured file_input_parameters: "
@@ -584,19 +784,26 @@ class Ttptttg:
 
         logger.debug("Found input files: " + str(input_files))
 
-        hash = hashlib.sha256()
-
+        paths = []
         for f in input_files:
             if isinstance(f, list):
                 files = f
             else:
                 files = [f]
             for ff in files:
-                abs_f = os.path.join(self.generator_input["files_root"], ff)
-                try:
-                    hash.update(pathlib.Path(abs_f).read_bytes())
-                except Exception as e:
-                    raise RuntimeError("Unable to hash file: " + str(e))
+                paths.append(os.path.join(self.generator_input["files_root"], ff))
+        return paths
+
+    def _sha256_file_input_hexdigest(self):
+        hash = hashlib.sha256()
+        # Unchanged files are not read again to calculate their digests
+        digest_cache = DigestCache(self.core.cache_root)
+
+        for abs_f in self.file_inputs():
+            try:
+                hash.update(digest_cache.sha256(abs_f).encode())
+            except Exception as e:
+                raise RuntimeError("Unable to hash file: " + str(e))
 
         return hash.hexdigest()
 
@@ -641,38 +848,47 @@ class Ttptttg:
     def is_cacheable(self):
         return self.is_input_cacheable() or self.is_generator_cacheable()
 
-    def acquire_cache_lock(self):
-        pass
-        # TODO: Implement cache locking
-        # have_lock = False
-        # while not have_lock:
-        #    if
+    def cache_key(self):
+        """Return the name of the directory where the generator is run
 
-    def generate(self):
-        """Run a parametrized generator
-
-        Returns:
-            list: Cores created by the generator
+        The name is made from the VLNV of the generator instance and a hash
+        of everything that affects the output of the generator: the input
+        data, the contents of the input files and the VLNV of the core that
+        provides the generator.
         """
-
         hexdigest = self._sha256_input_yaml_hexdigest()
-
         logger.debug("Generator parameters hash: " + hexdigest)
-
-        generator_cwd = os.path.join(
-            self.gen_root,
-            "generator_cache",
-            self.vlnv.sanitized_name + "-" + hexdigest,
-        )
+        key = {
+            "input": hexdigest,
+            "generator": self.generator.get("vlnv"),
+        }
 
         if "file_input_parameters" in self.generator:
             # If file_input_parameters has been configured in the generator
             # parameters will be iterated to look for files to add to the
             # input files hash calculation.
-            file_input_hash = self._sha256_file_input_hexdigest()
-            generator_cwd = os.path.join(generator_cwd, file_input_hash)
-            logger.debug("Generator input files hash: " + file_input_hash)
+            key["file_input"] = self._sha256_file_input_hexdigest()
+            logger.debug("Generator input files hash: " + key["file_input"])
+
+        key_hexdigest = hashlib.sha256(utils.yaml_dump(key).encode()).hexdigest()
+        return self.vlnv.sanitized_name + "-" + key_hexdigest
+
+    def generator_cwd(self):
+        """Return the directory where the generator is run"""
+        if self._generator_cwd is None:
+            self._generator_cwd = os.path.join(
+                self.gen_root, "generator_cache", self.cache_key()
+            )
+        return self._generator_cwd
+
+    def generate(self):
+        """Run a parametrized generator
+
+        Returns:
+            list: Cores created by the generator
+        """
 
+        generator_cwd = self.generator_cwd()
         logger.debug("Generator cwd: " + generator_cwd)
 
         if os.path.lexists(generator_cwd) and not os.path.isdir(generator_cwd):
@@ -683,16 +899,27 @@ class Ttptttg:
                 + "Remove it manually or run 'fusesoc gen clean'"
             )
 
-        if self.is_input_cacheable() and os.path.isdir(generator_cwd):
-            logger.info("Found cached output for " + str(self.vlnv))
+        cache = GeneratorCache(os.path.dirname(generator_cwd))
+        key = os.path.basename(generator_cwd)
+        if self.is_input_cacheable():
+            # The generator is run in a temporary directory which is only
+            # moved into the cache if the generator succeeds
+            with cache.use(key, self._run) as (path, found):
+                if found:
+                    logger.info("Found cached output for " + str(self.vlnv))
+                return self._find_cores(generator_cwd)
+        elif self.is_generator_cacheable():
+            logger.warning(
+                "Support for generator-side cachable cores are deprecated and will be removed"
+            )
+            # The generator updates its output in place, so make sure that
+            # only one process at a time runs it
+            with cache.lock(key):
+                self._run(generator_cwd)
+            with cache.lock(key, shared=True):
+                return self._find_cores(generator_cwd)
         else:
-            # TODO: Acquire a lock here to ensure that we are the only users
-            if self.is_generator_cacheable():
-                logger.warning(
-                    "Support for generator-side cachable cores are deprecated and will be removed"
-                )
-            else:
-                shutil.rmtree(generator_cwd, ignore_errors=True)
+            shutil.rmtree(generator_cwd, ignore_errors=True)
             try:
                 self._run(generator_cwd)
             except Exception:
@@ -704,8 +931,10 @@ class Ttptttg:
                 logger.debug("Generator failed, removing its output files")
                 shutil.rmtree(generator_cwd, ignore_errors=False)
                 raise
-            # TODO: Release cache lock
+        return self._find_cores(generator_cwd)
 
+    def _find_cores(self, generator_cwd):
+        """Return the cores created by the generator in generator_cwd"""
         cores = []
         logger.debug("Looking for generated or cached cores in " + generator_cwd)
         parser = Core2Parser(self.resolve_env_vars, allow_additional_properties=False)
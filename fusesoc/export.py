@@ -0,0 +1,255 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import logging
+import os
+import shutil
+from filecmp import cmp
+
+from fusesoc import utils
+from fusesoc.digest import is_racy, stat_key
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MODES = ["copy", "hardlink", "reflink", "symlink"]
+
+# ioctl request to share the data blocks of a file on Linux
+_FICLONE = 0x40049409
+# ioctl request to get the extents of a file on Linux, and the flags used
+_FS_IOC_FIEMAP = 0xC020660B
+_FIEMAP_FLAG_SYNC = 0x1
+_FIEMAP_EXTENT_SHARED = 0x2000
+_FIEMAP_MAX_EXTENTS = 64
+
+
+def _check_mode(mode):
+    if mode not in EXPORT_MODES:
+        raise RuntimeError(
+            f"Unknown export mode '{mode}'. Valid modes are " + ", ".join(EXPORT_MODES)
+        )
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _extents(path):
+    """Return (logical, physical, length) of the shared extents of path, or
+    None if they can not be found"""
+    import fcntl
+    import struct
+
+    header = struct.Struct("=QQLLLL")
+    extent = struct.Struct("=QQQ16xL12x")
+    buf = bytearray(header.size + extent.size * _FIEMAP_MAX_EXTENTS)
+    header.pack_into(
+        buf, 0, 0, 2**64 - 1, _FIEMAP_FLAG_SYNC, 0, _FIEMAP_MAX_EXTENTS, 0
+    )
+    with open(path, "rb") as f:
+        fcntl.ioctl(f.fileno(), _FS_IOC_FIEMAP, buf)
+    mapped = header.unpack_from(buf)[3]
+    extents = []
+    for i in range(mapped):
+        logical, physical, length, flags = extent.unpack_from(
+            buf, header.size + i * extent.size
+        )
+        if not flags & _FIEMAP_EXTENT_SHARED:
+            return None
+        extents.append((logical, physical, length))
+    return extents
+
+
+def _is_reflink(src, dst):
+    """Return True if dst shares all of its data blocks with src"""
+    try:
+        extents = _extents(dst)
+        return bool(extents) and extents == _extents(src)
+    except (OSError, ImportError):
+        return False
+
+
+def _is_exported(src, dst, mode):
+    """Return the mode used to export src to dst, or None if dst is not an
+    up to date export of src"""
+    if os.path.islink(dst):
+        if mode == "symlink" and os.readlink(dst) == src:
+            return "symlink"
+        return None
+    if not os.path.isfile(dst):
+        return None
+    if os.path.samefile(src, dst):
+        return "hardlink" if mode == "hardlink" else None
+    if mode != "symlink" and cmp(src, dst):
+        # A content-equal copy is up to date, but it is only a reflink if
+        # the data blocks are really shared
+        return "reflink" if mode == "reflink" and _is_reflink(src, dst) else "copy"
+    return None
+
+
+def export_file(src, dst, mode="copy"):
+    """Export the file src to dst, unless dst already is up to date
+
+    With mode hardlink, reflink or symlink, dst is created as a link to src
+    if possible, and falls back to a copy if not, e.g. when src and dst are
+    on different file systems. dst is always replaced instead of written to,
+    since it may be a link to src from an earlier export. Returns the mode
+    that was used.
+    """
+    _check_mode(mode)
+    src = os.path.abspath(src)
+    used_mode = _is_exported(src, dst, mode)
+    if used_mode:
+        return used_mode
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode != "copy":
+        try:
+            if mode == "hardlink":
+                os.link(src, dst)
+            elif mode == "symlink":
+                os.symlink(src, dst)
+            else:
+                _reflink(src, dst)
+            return mode
+        except (OSError, ImportError) as e:
+            logger.debug(f"Failed to {mode} {src} to {dst}, copying instead: {e}")
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+class ExportManifest:
+    """Export files to a directory, skipping files that are already there
+
+    The manifest records the source path and the stat info of the source and
+    destination of every exported file. On the next export to the same
+    directory, files whose source and destination are both unchanged are
+    skipped without reading them, and files that are no longer exported are
+    removed. Without a manifest from an earlier export, every file is
+    compared with its destination and the whole destination directory is
+    searched for leftover files.
+
+    The manifest is stored next to the destination directory, so that the
+    directory itself only contains the exported files. It also records the
+    requested export mode and, for each file, the mode that was actually used.
+    See export_file.
+    """
+
+    MANIFEST_VERSION = 2
+
+    def __init__(self, dst_dir, mode="copy"):
+        _check_mode(mode)
+        self.dst_dir = os.path.abspath(dst_dir)
+        self.mode = mode
+        self.manifest_file = os.path.join(
+            os.path.dirname(self.dst_dir),
+            "." + os.path.basename(self.dst_dir) + ".manifest",
+        )
+        manifest = utils.pickle_fread(self.manifest_file)
+        if (
+            manifest
+            and manifest.get("version") == self.MANIFEST_VERSION
+            and manifest.get("mode") == mode
+        ):
+            self._old_files = manifest["files"]
+        else:
+            self._old_files = None
+        # An export that fails halfway leaves files that are not in any
+        # manifest, so the next export must search for leftovers
+        try:
+            os.remove(self.manifest_file)
+        except FileNotFoundError:
+            pass
+        self._files = {}
+        self._dirs = set()
+
+    def _is_unchanged(self, rel, src, src_st, dst):
+        entry = (self._old_files or {}).get(rel)
+        if not entry or entry["src"] != src or entry["src_stat"] != stat_key(src_st):
+            return False
+        try:
+            return entry["dst_stat"] == stat_key(os.lstat(dst))
+        except OSError:
+            return False
+
+    def export(self, src, rel):
+        """Export the file or directory src to rel in the destination"""
+        if os.path.isdir(src):
+            for root, dirs, files in os.walk(src):
+                for f in files:
+                    _src = os.path.join(root, f)
+                    self.export(_src, os.path.join(rel, os.path.relpath(_src, src)))
+            return
+
+        rel = os.path.normpath(rel)
+        dst = os.path.join(self.dst_dir, rel)
+        src = os.path.abspath(src)
+        src_st = os.stat(src)
+
+        if not self._is_unchanged(rel, src, src_st, dst):
+            dst_dir = os.path.dirname(dst)
+            if dst_dir not in self._dirs:
+                os.makedirs(dst_dir, exist_ok=True)
+                self._dirs.add(dst_dir)
+            # Only update if file is changed or doesn't exist
+            used_mode = export_file(src, dst, self.mode)
+        else:
+            used_mode = self._old_files[rel]["mode"]
+
+        # Recently modified sources are compared again on the next export
+        if is_racy(src_st):
+            src_key = None
+        else:
+            src_key = stat_key(src_st)
+        self._files[rel] = {
+            "src": src,
+            "src_stat": src_key,
+            "dst_stat": stat_key(os.lstat(dst)),
+            "mode": used_mode,
+        }
+
+    @property
+    def files(self):
+        """Dict with the manifest entry of each exported file, by relative path"""
+        return self._files
+
+    def add_dir(self, rel):
+        """Create the directory rel in the destination"""
+        os.makedirs(os.path.join(self.dst_dir, rel), exist_ok=True)
+
+    def finish(self):
+        """Remove leftover files from earlier exports and save the manifest"""
+        if self._old_files is not None:
+            stale = set(self._old_files) - set(self._files)
+            for rel in stale:
+                try:
+                    os.remove(os.path.join(self.dst_dir, rel))
+                except FileNotFoundError:
+                    pass
+        else:
+            for root, dirs, files in os.walk(self.dst_dir):
+                for f in files:
+                    _abs_f = os.path.join(root, f)
+                    _rel_f = os.path.normpath(os.path.relpath(_abs_f, self.dst_dir))
+                    if _rel_f not in self._files:
+                        os.remove(_abs_f)
+
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "mode": self.mode,
+            "files": self._files,
+        }
+        try:
+            utils.pickle_fwrite(self.manifest_file, manifest)
+        except OSError as e:
+            logger.debug(f"Failed to write export manifest {self.manifest_file}: {e}")
@@ -0,0 +1,85 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import hashlib
+import logging
+import os
+import time
+
+from fusesoc import utils
+from fusesoc.digest import is_racy, stat_key
+
+logger = logging.getLogger(__name__)
+
+
+class RunFingerprint:
+    """Fingerprint of the inputs and outputs of creating an EDAM file
+
+    The fingerprint consists of a key and the stat info of a set of files. The
+    key must identify everything besides the files that affects the EDAM file
+    and the exported files, such as the flags, the backend arguments and the
+    resolved cores. The files are the input files, such as the core files and
+    the sources of the exported files, and the output files, such as the EDAM
+    file and the exported files. As long as the key is the same and none of
+    the files has changed, the outputs of the last run are still valid.
+    """
+
+    VERSION = 1
+
+    def __init__(self, fingerprint_file, key):
+        self.fingerprint_file = fingerprint_file
+        self.key = hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def is_current(self):
+        """Return True if the stored fingerprint matches the current state"""
+        fingerprint = utils.pickle_fread(self.fingerprint_file)
+        if (
+            not fingerprint
+            or fingerprint.get("version") != self.VERSION
+            or fingerprint["key"] != self.key
+        ):
+            return False
+        for path, key in fingerprint["files"].items():
+            try:
+                if stat_key(os.lstat(path)) != key:
+                    logger.debug(f"Run fingerprint mismatch, {path} has changed")
+                    return False
+            except OSError:
+                logger.debug(f"Run fingerprint mismatch, {path} is missing")
+                return False
+        return True
+
+    def invalidate(self):
+        """Remove the stored fingerprint"""
+        try:
+            os.remove(self.fingerprint_file)
+        except FileNotFoundError:
+            pass
+
+    def store(self, inputs, outputs):
+        """Store the fingerprint for the given input and output files
+
+        Nothing is stored if any input file was modified too recently to be
+        trusted.
+        """
+        now = time.time()
+        files = {}
+        try:
+            for path in inputs:
+                st = os.lstat(path)
+                if is_racy(st, now):
+                    logger.debug(f"Not storing run fingerprint, {path} is too new")
+                    return
+                files[path] = stat_key(st)
+            for path in outputs:
+                files[path] = stat_key(os.lstat(path))
+        except OSError as e:
+            logger.debug(f"Not storing run fingerprint: {e}")
+            return
+
+        fingerprint = {"version": self.VERSION, "key": self.key, "files": files}
+        try:
+            utils.pickle_fwrite(self.fingerprint_file, fingerprint)
+        except OSError as e:
+            logger.debug(f"Failed to write run fingerprint: {e}")
@@ -2,15 +2,24 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import importlib.metadata
 import logging
 import os
 from importlib import import_module
 from pathlib import Path
 
 from fusesoc.coremanager import CoreManager, DependencyError
-from fusesoc.edalizer import Edalizer
+from fusesoc.digest import stat_key
+from fusesoc.edalizer import EDAM_FORMATS, Edalizer
+from fusesoc.fingerprint import RunFingerprint
 from fusesoc.librarymanager import Library, LibraryManager
-from fusesoc.utils import setup_logging, yaml_fread
+from fusesoc.utils import (
+    json_fread,
+    pickle_fread,
+    pickle_fwrite,
+    setup_logging,
+    yaml_fread,
+)
 from fusesoc.vlnv import Vlnv
 
 try:
@@ -18,6 +27,11 @@ try:
 except ImportError:
     from edalize import get_edatool
 
+try:
+    from fusesoc.version import version as __version__
+except ImportError:
+    __version__ = "unknown"
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,11 +46,28 @@ class Fusesoc:
 
     def _register_libraries(self):
         cores_root_libs = [Library(acr, acr) for acr in self.config.cores_root]
+        libraries = self.config.libraries + cores_root_libs
+
+        # Check out all missing libraries at once before registering them
+        missing = [
+            library
+            for library in libraries
+            if library.sync_type != "local" and not os.path.exists(library.location)
+        ]
+        if missing:
+            LibraryManager.update_libraries(
+                missing, force=True, jobs=self.config.library_jobs
+            )
+
         # Add libraries from config file, env var and command-line
-        for library in self.config.libraries + cores_root_libs:
+        for library in libraries:
             try:
                 self.add_library(library)
-            except (RuntimeError, OSError):
+            except (RuntimeError, OSError) as e:
+                if library in missing:
+                    # The checkout above already failed
+                    logger.warning(f"Failed to register library '{library.name}': {e}")
+                    continue
                 try:
                     temporary_lm = LibraryManager(self.config.library_root)
                     # try to initialize library
@@ -45,8 +76,7 @@ class Fusesoc:
                     # the initialization worked, now register it properly
                     self.add_library(library)
                 except (RuntimeError, OSError) as e:
-                    _s = "Failed to register library '{}'"
-                    logger.warning(_s.format(str(e)))
+                    logger.warning(f"Failed to register library '{library.name}': {e}")
 
     @staticmethod
     def init_logging(verbose, monochrome, log_file=None):
@@ -74,17 +104,39 @@ class Fusesoc:
         return self.lm.get_library(library_name)
 
     def update_libraries(self, library_names):
-        self.lm.update(library_names)
+        return self.lm.update(library_names, self.config.library_jobs)
 
     def get_libraries(self):
         return self.lm.get_libraries()
 
+    def reindex_libraries(self, library_names):
+        libraries = []
+        for name in library_names:
+            library = self.lm.get_library(name)
+            if library:
+                libraries.append(library)
+            else:
+                logger.warning(f"Could not find library {name}")
+        if not library_names:
+            libraries = self.lm.get_libraries()
+
+        for library in libraries:
+            try:
+                core_files = self.cm.reindex_library(library, self.config.ignored_dirs)
+            except OSError as e:
+                logger.warning(f"{library.name} : Failed to reindex library: {e}")
+                continue
+            logger.info(f"{library.name} : Indexed {len(core_files)} core files")
+
     def get_core(self, name):
         return self.cm.get_core(Vlnv(name))
 
     def get_cores(self):
         return self.cm.get_cores()
 
+    def find_core_names(self, name):
+        return self.cm.find_core_names(name)
+
     def find_cores(self, library):
         return self.cm.find_cores(library, self.config.ignored_dirs)
 
@@ -115,6 +167,105 @@ class Fusesoc:
 
         return work_root
 
+    def _run_fingerprint(
+        self,
+        edalizer,
+        core,
+        flags,
+        backendargs,
+        backend_class,
+        work_root,
+        export_root,
+        edam_file,
+    ):
+        """Get the fingerprint of the inputs to the EDAM file
+
+        Returns None if fingerprints are disabled or can not be used
+        """
+        if not self.config.run_fingerprint or self.config.resolve_env_vars_early:
+            return None
+
+        try:
+            edalize_version = importlib.metadata.version("edalize")
+        except Exception:
+            edalize_version = None
+
+        try:
+            deps = edalizer.resolved_cores
+            generator_cache_keys = edalizer.generator_cache_keys()
+        except (DependencyError, RuntimeError) as e:
+            # Reported when creating the EDAM file
+            logger.debug(f"Not using run fingerprint: {e}")
+            return None
+
+        key = [
+            __version__,
+            edalize_version,
+            backend_class.__module__,
+            backend_class.__name__,
+            str(core.name),
+            sorted((k, str(v)) for k, v in flags.items()),
+            backendargs,
+            work_root,
+            export_root,
+            self.config.export_mode,
+            self.config.edam_format,
+            self.config.system_name,
+            self.config.cache_root,
+            self.config.filters,
+            [(str(dep.name), dep.core_file) for dep in deps],
+            generator_cache_keys,
+        ]
+        fingerprint_file = os.path.splitext(edam_file)[0] + ".fingerprint"
+        return RunFingerprint(fingerprint_file, key)
+
+    def _read_edam(self, edam_file):
+        if edam_file.endswith(".json"):
+            return json_fread(edam_file)
+        return yaml_fread(edam_file, self.config.resolve_env_vars_early)
+
+    def _write_edam(self, edalizer, edam_file):
+        """Write the EDAM file, unless the existing file has the same contents
+
+        Leaving an unchanged EDAM file untouched keeps its modification time,
+        so that the backend is not configured again. The hash of the EDAM is
+        stored next to the EDAM file, together with the stat info of the file
+        it was written to. As long as the file is unchanged, the hashes are
+        compared instead of parsing the old file.
+        """
+        hash_file = os.path.splitext(edam_file)[0] + ".hash"
+        edam_hash = edalizer.edam_hash()
+
+        stored = pickle_fread(hash_file)
+        try:
+            edam_stat = stat_key(os.stat(edam_file))
+        except OSError:
+            edam_stat = None
+
+        if stored and edam_stat and stored.get("edam_stat") == edam_stat:
+            unchanged = stored.get("sha256") == edam_hash
+        elif edam_stat:
+            try:
+                unchanged = self._read_edam(edam_file) == edalizer.edam
+            except SyntaxError:
+                unchanged = False
+        else:
+            unchanged = False
+
+        if not unchanged:
+            if edam_file.endswith(".json"):
+                edalizer.to_json(edam_file)
+            else:
+                edalizer.to_yaml(edam_file)
+            edam_stat = stat_key(os.stat(edam_file))
+
+        entry = {"sha256": edam_hash, "edam_stat": edam_stat}
+        if stored != entry:
+            try:
+                pickle_fwrite(hash_file, entry)
+            except OSError as e:
+                logger.debug(f"Failed to write EDAM hash {hash_file}: {e}")
+
     def get_backend(self, core, flags, backendargs=[]):
 
         work_root = self.get_work_root(core, flags)
@@ -125,7 +276,14 @@ class Fusesoc:
         else:
             export_root = None
 
-        edam_file = os.path.join(work_root, core.name.sanitized_name + ".eda.yml")
+        edam_format = self.config.edam_format
+        if edam_format not in EDAM_FORMATS:
+            raise RuntimeError(
+                f"Unknown EDAM format '{edam_format}'. Valid formats are "
+                + ", ".join(EDAM_FORMATS)
+            )
+        edam_ext = ".eda.yml" if edam_format == "yaml" else ".eda.json"
+        edam_file = os.path.join(work_root, core.name.sanitized_name + edam_ext)
 
         flow = core.get_flow(flags)
 
@@ -156,8 +314,29 @@ class Fusesoc:
             export_root=export_root,
             system_name=self.config.system_name,
             resolve_env_vars=self.config.resolve_env_vars_early,
+            export_mode=self.config.export_mode,
         )
 
+        fingerprint = self._run_fingerprint(
+            edalizer,
+            core,
+            flags,
+            backendargs,
+            backend_class,
+            work_root,
+            export_root,
+            edam_file,
+        )
+        if fingerprint and os.path.exists(edam_file) and fingerprint.is_current():
+            logger.info("Inputs are unchanged, reusing " + edam_file)
+            edam = self._read_edam(edam_file)
+            return edam_file, backend_class(
+                edam=edam, work_root=work_root, verbose=self.config.verbose
+            )
+        elif fingerprint:
+            # Don't trust the old fingerprint if this run fails halfway
+            fingerprint.invalidate()
+
         try:
             edalizer.run()
             edalizer.export()
@@ -171,13 +350,12 @@ class Fusesoc:
         except DependencyError as e:
             raise RuntimeError("Failed to resolve dependencies. " + e.msg)
 
-        if os.path.exists(edam_file):
-            old_edam = yaml_fread(edam_file, self.config.resolve_env_vars_early)
-        else:
-            old_edam = None
+        self._write_edam(edalizer, edam_file)
 
-        if edalizer.edam != old_edam:
-            edalizer.to_yaml(edam_file)
+        files = fingerprint and edalizer.fingerprint_files()
+        if files:
+            inputs, outputs = files
+            fingerprint.store(inputs, outputs + [edam_file])
 
         return edam_file, backend_class(
             edam=edalizer.edam, work_root=work_root, verbose=self.config.verbose
@@ -0,0 +1,199 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from fusesoc import utils
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratorCache:
+    """Cache of generator outputs that can be shared between processes
+
+    Each entry is a directory named by a key that identifies the generator
+    output. Entries are created by running the generator in a temporary
+    directory, which is renamed into place when the generator has finished,
+    so an entry is never seen half-written. A lock file per entry makes sure
+    that only one process at a time runs the generator for a key. Other
+    processes wait for it and then use its output. Processes that use an
+    entry hold a shared lock on it, so that it is not evicted meanwhile.
+
+    The modification time of an entry directory is updated whenever the entry
+    is used, and is used to evict entries that have not been used recently.
+    """
+
+    LOCK_DIR = ".locks"
+    TMP_PREFIX = ".tmp-"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _lock_file(self, key):
+        return os.path.join(self.cache_dir, self.LOCK_DIR, key + ".lock")
+
+    def lock(self, key, blocking=True, shared=False):
+        """Lock the entry for key. See utils.file_lock"""
+        return utils.file_lock(self._lock_file(key), blocking, shared)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError as e:
+            logger.debug(f"Failed to update access time of {path}: {e}")
+
+    def get(self, key):
+        """Return the directory of the entry for key, or None if there is none
+
+        The entry may be evicted at any time, unless the caller holds a lock
+        on it. See use.
+        """
+        path = self.path(key)
+        if not os.path.isdir(path):
+            return None
+        self._touch(path)
+        return path
+
+    def add(self, key, generate):
+        """Return the directory of the entry for key, creating it if needed
+
+        generate is called with the path of an empty directory and must fill
+        it with the generator output. If it raises an exception, nothing is
+        added to the cache.
+        """
+        path = self.path(key)
+        with self.lock(key):
+            if os.path.isdir(path):
+                # Created by someone else while we were waiting for the lock
+                self._touch(path)
+                return path
+
+            # Anything left behind for this key was left by a process that
+            # died while holding the lock
+            self._remove_tmp_dirs(key)
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(
+                prefix=f"{self.TMP_PREFIX}{key}-", dir=self.cache_dir
+            )
+            try:
+                generate(tmp_dir)
+                os.rename(tmp_dir, path)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+        return path
+
+    @contextmanager
+    def use(self, key, generate):
+        """Use the entry for key, creating it with generate if needed
+
+        Yields the directory of the entry and whether it was already in the
+        cache. A shared lock is held on the entry until the context is left,
+        so it is not evicted while it is in use. See add for generate.
+        """
+        found = True
+        while True:
+            with self.lock(key, shared=True):
+                path = self.get(key)
+                if path:
+                    yield path, found
+                    return
+            # Evicted again before we got the lock, if it was just created
+            self.add(key, generate)
+            found = False
+
+    def _remove_tmp_dirs(self, key):
+        prefix = f"{self.TMP_PREFIX}{key}-"
+        for name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            if name.startswith(prefix):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def _entries(self):
+        """Return (key, size in bytes, last use) for all entries"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                continue
+            size = 0
+            for root, dirs, files in os.walk(entry.path):
+                for f in files:
+                    try:
+                        size += os.lstat(os.path.join(root, f)).st_size
+                    except OSError:
+                        pass
+            entries.append((entry.name, size, entry.stat().st_mtime))
+        return entries
+
+    def stats(self):
+        """Return a dict with the number of entries, their total size and the
+        times of the least and most recently used entries"""
+        entries = self._entries()
+        last_uses = [last_use for _, _, last_use in entries]
+        return {
+            "entries": len(entries),
+            "size": sum(size for _, size, _ in entries),
+            "oldest": min(last_uses, default=None),
+            "newest": max(last_uses, default=None),
+        }
+
+    def evict(self, max_size=0, max_age=0, keep=()):
+        """Remove entries until the cache satisfies the given limits
+
+        Entries that have not been used for more than max_age seconds are
+        removed first. After that, the least recently used entries are
+        removed until the total size is at most max_size bytes. A limit of 0
+        means no limit. Entries whose keys are in keep, e.g. the ones used by
+        the current build, and entries that are locked by another process are
+        left alone, even if that means the limits are not met. Returns the
+        keys of the removed entries.
+        """
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+        removed = []
+        for key, size, last_use in entries:
+            too_old = max_age and now - last_use > max_age
+            too_big = max_size and total_size > max_size
+            if key in keep or not (too_old or too_big):
+                continue
+            with self.lock(key, blocking=False) as locked:
+                if not locked or not os.path.isdir(self.path(key)):
+                    continue
+                # Rename first, so that the entry disappears at once
+                tmp_dir = tempfile.mkdtemp(
+                    prefix=f"{self.TMP_PREFIX}{key}-", dir=self.cache_dir
+                )
+                os.rename(self.path(key), os.path.join(tmp_dir, key))
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                os.remove(self._lock_file(key))
+            logger.debug(f"Evicted {key} from generator cache")
+            total_size -= size
+            removed.append(key)
+        self._remove_stale_locks()
+        return removed
+
+    def _remove_stale_locks(self):
+        """Remove the lock files of keys that have no entry, e.g. because
+        their generator failed"""
+        lock_dir = os.path.join(self.cache_dir, self.LOCK_DIR)
+        if not os.path.isdir(lock_dir):
+            return
+        for name in os.listdir(lock_dir):
+            key = name[: -len(".lock")]
+            if not name.endswith(".lock") or os.path.isdir(self.path(key)):
+                continue
+            with self.lock(key, blocking=False) as locked:
+                if locked and not os.path.isdir(self.path(key)):
+                    os.remove(self._lock_file(key))
@@ -0,0 +1,223 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import hashlib
+import logging
+import os
+import time
+
+from fusesoc import utils
+from fusesoc.digest import is_racy, stat_key
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryIndex:
+    """Find the core files in a library, optionally using a persistent index
+
+    The index records the subdirectories and core files found in each
+    directory of the library together with the mtime of the directory. Since
+    the mtime of a directory changes whenever an entry is added to, removed
+    from or renamed in it, only directories with a changed mtime need to be
+    listed again. All directories are still visited, so that changes anywhere
+    in the tree are detected.
+
+    The index can also hold a header for each core file, i.e. the subset of
+    the core description that is needed to register the core without parsing
+    it. Headers are looked up by the stat info of the core file and a key
+    identifying the parser options.
+    """
+
+    INDEX_VERSION = 2
+    EXCLUDE = {".git"}
+
+    def __init__(self, location, cache_root=None):
+        self.location = location
+        if cache_root:
+            name = hashlib.sha256(os.path.abspath(location).encode()).hexdigest()
+            self.index_file = os.path.join(cache_root, "library_index", name[:16])
+        else:
+            self.index_file = None
+        self._dirs = None
+        self._headers = None
+        self._changed = False
+
+    def _load(self):
+        if self._dirs is not None:
+            return
+        self._dirs = {}
+        self._headers = {}
+        if not self.index_file:
+            return
+        index = utils.pickle_fread(self.index_file)
+        if not index or index.get("version") != self.INDEX_VERSION:
+            return
+        if index.get("location") != self.location:
+            return
+        self._dirs = index["dirs"]
+        self._headers = index["headers"]
+
+    def save(self):
+        """Write the index back to disk if it has changed"""
+        if not (self.index_file and self._changed):
+            return
+        index = {
+            "version": self.INDEX_VERSION,
+            "location": self.location,
+            "dirs": self._dirs,
+            "headers": self._headers,
+        }
+        self._changed = False
+        try:
+            utils.pickle_fwrite(self.index_file, index)
+        except OSError as e:
+            logger.debug(f"Failed to write library index {self.index_file}: {e}")
+
+    def remove(self):
+        """Remove the persistent index"""
+        if self.index_file and os.path.exists(self.index_file):
+            os.remove(self.index_file)
+
+    @staticmethod
+    def _scan(root):
+        """List the subdirectories and core files of root
+
+        Returns None if the directory can not be listed.
+        """
+        dirs = []
+        core_files = []
+        ignore = False
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                    elif entry.name == "FUSESOC_IGNORE":
+                        ignore = True
+                    elif entry.name.endswith(".core"):
+                        core_files.append(entry.name)
+        except OSError:
+            return None
+        return dirs, core_files, ignore
+
+    def find_core_files(self, ignored_dirs, rescan=False):
+        """Return the paths of all core files in the library
+
+        The library is walked top-down, following symlinks, in the same order
+        as os.walk. Directories containing a file called FUSESOC_IGNORE or
+        that are in ignored_dirs are skipped together with all their
+        subdirectories. Directories that were already visited through another
+        path are skipped to protect against symlink loops.
+
+        If rescan is set, the persistent index is ignored and rebuilt.
+        """
+        self._load()
+        if rescan:
+            self._dirs = {}
+            self._headers = {}
+        old_dirs = self._dirs
+        new_dirs = {}
+        scan_start = time.time()
+        rescanned = 0
+
+        found = []
+        visited = set()
+        stack = [(self.location, None)]
+        while stack:
+            root, st = stack.pop()
+            try:
+                if st is None:
+                    st = os.stat(root)
+            except OSError:
+                continue
+
+            cached = old_dirs.get(root)
+            if cached and cached[0] is not None and cached[0] == st.st_mtime_ns:
+                listing = cached[1:]
+            else:
+                listing = self._scan(root)
+                if listing is None:
+                    continue
+                rescanned += 1
+            mtime = st.st_mtime_ns
+            # Recently modified directories are rescanned on the next run
+            if is_racy(st, scan_start):
+                mtime = None
+            new_dirs[root] = (mtime,) + listing
+
+            dirs, core_files, ignore = listing
+            if ignore or os.path.realpath(root) in ignored_dirs:
+                continue
+
+            found += [os.path.join(root, f) for f in core_files]
+
+            children = []
+            for _d in dirs:
+                # Ignore sub dirs in the exclude set
+                if _d in self.EXCLUDE:
+                    continue
+
+                path = os.path.join(root, _d)
+                try:
+                    child_st = os.stat(path)
+                except OSError:
+                    continue
+                dirkey = child_st.st_dev, child_st.st_ino
+                # Ignore dirs we already visited. Protects against endless symlink recursion
+                if dirkey in visited:
+                    continue
+
+                visited.add(dirkey)
+                children.append((path, child_st))
+
+            stack += reversed(children)
+
+        logger.debug(
+            "Listed {} of {} directories in {}".format(
+                rescanned, len(new_dirs), self.location
+            )
+        )
+        if new_dirs != old_dirs:
+            self._dirs = new_dirs
+            self._changed = True
+
+        # Forget the headers of removed core files
+        found_set = set(found)
+        for core_file in list(self._headers):
+            if core_file not in found_set:
+                del self._headers[core_file]
+                self._changed = True
+
+        self.save()
+        return found
+
+    def get_header(self, core_file, parser_key):
+        """Return the stored header of core_file, or None if it is outdated"""
+        self._load()
+        entry = self._headers.get(core_file)
+        if not entry or entry[0] is None or entry[1] != parser_key:
+            return None
+        try:
+            if stat_key(os.stat(core_file)) != entry[0]:
+                return None
+        except OSError:
+            return None
+        return entry[2]
+
+    def set_header(self, core_file, parser_key, st, header):
+        """Store the header of core_file
+
+        st is the os.stat_result of core_file from before it was parsed.
+        Call save() to write the index to disk.
+        """
+        self._load()
+        key = stat_key(st)
+        if is_racy(st):
+            key = None
+        self._headers[core_file] = (key, parser_key, header)
+        self._changed = True
@@ -4,6 +4,7 @@
 
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from fusesoc.provider.provider import get_provider
 
@@ -41,16 +42,22 @@ class Library:
         self.auto_sync = auto_sync
 
     def update(self, force=False):
+        """Update the library, or check it out if it does not exist
+
+        Returns True if the library was updated or checked out, False if that
+        failed and None if the library is not updated.
+        """
+
         def lib(s):
             return self.name + " : " + s
 
         if self.sync_type == "local":
             logger.info(lib("sync-type is local. Ignoring update"))
-            return
+            return None
 
         if not (self.auto_sync or force):
             logger.info(lib("auto-sync disabled. Ignoring update"))
-            return
+            return None
 
         provider = get_provider(self.sync_type)
 
@@ -63,13 +70,16 @@ class Library:
                 # in `fusesoc.conf`, but the directory does not exist for some
                 # reason and it could not be initialized.
                 logger.warning(lib(f"{self.location} does not exist. Ignoring update"))
-            return
+                return False
+            return True
 
         try:
             logger.info(lib("Updating..."))
             provider.update_library(self)
         except RuntimeError as e:
             logger.error(lib("Failed to update library: " + str(e)))
+            return False
+        return True
 
 
 class LibraryManager:
@@ -88,7 +98,7 @@ class LibraryManager:
     def get_libraries(self):
         return self._libraries
 
-    def update(self, library_names):
+    def update(self, library_names, jobs=1):
         libraries = []
         for name in library_names:
             library = self.get_library(name)
@@ -103,5 +113,26 @@ class LibraryManager:
             libraries = self._libraries
             force = False
 
-        for library in libraries:
-            library.update(force)
+        return LibraryManager.update_libraries(libraries, force, jobs)
+
+    @staticmethod
+    def update_libraries(libraries, force=False, jobs=1):
+        """Update or check out libraries, up to jobs libraries at a time
+
+        Logs a summary at the end and returns False if any library failed.
+        """
+        if jobs > 1 and len(libraries) > 1:
+            with ThreadPoolExecutor(max_workers=min(jobs, len(libraries))) as executor:
+                results = list(executor.map(lambda l: l.update(force), libraries))
+        else:
+            results = [library.update(force) for library in libraries]
+
+        updated = [l.name for l, result in zip(libraries, results) if result]
+        failed = [l.name for l, result in zip(libraries, results) if result is False]
+        if updated or failed:
+            logger.info(
+                "Updated {} of {} libraries".format(len(updated), len(libraries))
+            )
+        if failed:
+            logger.error("Failed to update libraries: " + ", ".join(failed))
+        return not failed
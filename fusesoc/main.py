@@ -10,6 +10,7 @@ import pathlib
 import shutil
 import signal
 import sys
+import time
 import warnings
 from pathlib import Path
 
@@ -26,19 +27,18 @@ import logging
 
 from fusesoc.config import Config
 from fusesoc.coremanager import DependencyError
+from fusesoc.edalizer import EDAM_FORMATS
+from fusesoc.export import EXPORT_MODES
 from fusesoc.fusesoc import Fusesoc
+from fusesoc.generatorcache import GeneratorCache
 from fusesoc.librarymanager import Library
 
 logger = logging.getLogger(__name__)
 
 
 def _get_core(cm, core_name):
-    matches = set()
     if ":" not in core_name:
-        for core in cm.get_cores():
-            (vendor, library, name, _) = core.split(":")
-            if name.lower() == core_name.lower():
-                matches.add(f"{vendor}:{library}:{name}")
+        matches = cm.find_core_names(core_name)
         if len(matches) == 1:
             core_name = matches.pop()
         elif len(matches) > 1:
@@ -297,6 +297,29 @@ def gen_clean(fs, args):
     print(f"Cleaned generator cache: {cachedir}")
 
 
+def gen_cache_stats(fs, args):
+    cachedir = os.path.join(fs.config.cache_root, "generator_cache")
+    stats = GeneratorCache(cachedir).stats()
+
+    def _time(t):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) if t else "-"
+
+    print(
+        """
+Cache directory     : {}
+Entries             : {}
+Size                : {:.1f} MiB
+Least recently used : {}
+Most recently used  : {}""".format(
+            cachedir,
+            stats["entries"],
+            stats["size"] / 2**20,
+            _time(stats["oldest"]),
+            _time(stats["newest"]),
+        )
+    )
+
+
 def run(fs, args):
     stages = (args.setup, args.build, args.run)
 
@@ -431,7 +454,12 @@ def prepare_work_root(work_root):
 
 
 def update(fs, args):
-    fs.update_libraries(args.libraries)
+    if not fs.update_libraries(args.libraries):
+        exit(1)
+
+
+def reindex(fs, args):
+    fs.reindex_libraries(args.libraries)
 
 
 class CoreCompleter:
@@ -498,6 +526,26 @@ def get_parser():
     parser.add_argument("--verbose", help="More info messages", action="store_true")
     parser.add_argument("--log-file", help="Write log messages to file")
     parser.add_argument("--ssh-trustfile", help="Override trustfile in fusesoc.conf")
+    parser.add_argument(
+        "--parse-jobs",
+        help="Number of processes to use for parsing core files (0 = one per CPU)",
+        type=int,
+    )
+    parser.add_argument(
+        "--fetch-jobs",
+        help="Number of cores to fetch in parallel (0 = one per CPU)",
+        type=int,
+    )
+    parser.add_argument(
+        "--library-jobs",
+        help="Number of libraries to update in parallel (0 = one per CPU)",
+        type=int,
+    )
+    parser.add_argument(
+        "--generator-jobs",
+        help="Number of generators to run in parallel (0 = one per CPU)",
+        type=int,
+    )
 
     # fetch subparser
     parser_fetch = subparsers.add_parser(
@@ -585,6 +633,19 @@ def get_parser():
     )
     parser_gen_clean.set_defaults(func=gen_clean)
 
+    # gen cache subparser
+    parser_gen_cache = gen_subparsers.add_parser(
+        "cache", help="Show information about the generator cache"
+    )
+    parser_gen_cache.set_defaults(subparser=parser_gen_cache)
+    gen_cache_subparsers = parser_gen_cache.add_subparsers()
+
+    # gen cache stats subparser
+    parser_gen_cache_stats = gen_cache_subparsers.add_parser(
+        "stats", help="Show the size and number of entries in the generator cache"
+    )
+    parser_gen_cache_stats.set_defaults(func=gen_cache_stats)
+
     # list-paths subparser
     parser_list_paths = subparsers.add_parser(
         "list-paths", help="Display the search order for core root paths"
@@ -652,6 +713,15 @@ def get_parser():
     )
     parser_library_update.set_defaults(func=update)
 
+    # library reindex subparser
+    parser_library_reindex = library_subparsers.add_parser(
+        "reindex", help="Rebuild the index of core files in the libraries"
+    )
+    parser_library_reindex.add_argument(
+        "libraries", nargs="*", help="The libraries to reindex (defaults to all)"
+    )
+    parser_library_reindex.set_defaults(func=reindex)
+
     # run subparser
     parser_run = subparsers.add_parser("run", help="Start a tool flow")
     parser_run.add_argument(
@@ -664,6 +734,16 @@ def get_parser():
         action="store_true",
         help="Reference source files from their current location instead of exporting to a build tree",
     )
+    parser_run.add_argument(
+        "--export-mode",
+        choices=EXPORT_MODES,
+        help="How to export source files to the build tree (defaults to copy)",
+    )
+    parser_run.add_argument(
+        "--edam-format",
+        choices=EDAM_FORMATS,
+        help="File format of the EDAM file (defaults to yaml)",
+    )
     parser_run.add_argument(
         "--build-root",
         help="Output directory for build. VLNV will be appended (defaults to build/)",
@@ -770,6 +850,12 @@ def args_to_config(args, config):
     if hasattr(args, "no_export") and args.no_export:
         setattr(config, "args_no_export", args.no_export)
 
+    if hasattr(args, "export_mode") and args.export_mode:
+        setattr(config, "args_export_mode", args.export_mode)
+
+    if hasattr(args, "edam_format") and args.edam_format:
+        setattr(config, "args_edam_format", args.edam_format)
+
     if hasattr(args, "build_root") and args.build_root and len(args.build_root) > 0:
         setattr(config, "args_build_root", args.build_root)
 
@@ -782,6 +868,10 @@ def args_to_config(args, config):
     if hasattr(args, "system_name") and args.system_name and len(args.system_name) > 0:
         setattr(config, "args_system_name", args.system_name)
 
+    for jobs in ["parse_jobs", "fetch_jobs", "library_jobs", "generator_jobs"]:
+        if getattr(args, jobs, None) is not None:
+            setattr(config, "args_" + jobs, getattr(args, jobs))
+
     if hasattr(args, "filter"):
         config.args_filters = args.filter
 
@@ -0,0 +1,111 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import hashlib
+import logging
+import os
+import re
+
+from fusesoc import utils
+from fusesoc.digest import is_racy, sha256_file, stat_key
+
+logger = logging.getLogger(__name__)
+
+# Matches the environment variable references that os.path.expandvars replaces
+_ENV_VAR_PATTERN = re.compile(r"\$(\w+|\{[^}]*\})|%([^%]*)%")
+
+
+def _referenced_env_vars(filepath):
+    with open(filepath, errors="replace") as f:
+        names = set()
+        for m in _ENV_VAR_PATTERN.finditer(f.read()):
+            name = m.group(1) or m.group(2)
+            names.add(name.strip("{}"))
+    return {name: os.environ.get(name) for name in sorted(names)}
+
+
+class ParseCache:
+    """Persistent cache of parsed and validated core description files
+
+    Each entry holds the data that CoreParser.read returned for one core file.
+    Entries are looked up by the stat info (mtime, size and inode) of the core
+    file, and if that has changed, by the SHA256 of the file contents.
+
+    The cache is split into namespaces by key. The caller must derive the key
+    from everything except the core file itself that affects the parsed result,
+    such as the FuseSoC version, the schema and the parser options.
+    """
+
+    def __init__(self, cache_root, key, resolve_env_vars=False):
+        self.cache_dir = os.path.join(cache_root, "parser_cache", key)
+        self._resolve_env_vars = resolve_env_vars
+
+    def _entry_path(self, core_file):
+        name = hashlib.sha256(os.path.abspath(core_file).encode()).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def load(self, core_file):
+        """Return the cached data for core_file or None if it is not cached"""
+        try:
+            st = os.stat(core_file)
+        except OSError:
+            return None
+
+        entry_path = self._entry_path(core_file)
+        entry = utils.pickle_fread(entry_path)
+        if not entry:
+            return None
+
+        for name, value in entry["env"].items():
+            if os.environ.get(name) != value:
+                return None
+
+        if entry["stat"] == stat_key(st):
+            return entry["data"]
+
+        try:
+            sha256 = sha256_file(core_file)
+        except OSError:
+            return None
+        if sha256 != entry["sha256"]:
+            return None
+
+        # The file was touched but the contents are unchanged. Update the stat
+        # info to avoid hashing the file on the next lookup.
+        entry["stat"] = self._trusted_stat_key(st)
+        self._write(entry_path, entry)
+        return entry["data"]
+
+    def store(self, core_file, capi_data, st):
+        """Store capi_data as the parsed contents of core_file
+
+        st is the os.stat_result of core_file from before it was read. The
+        entry is only stored if the file has not changed since then.
+        """
+        try:
+            sha256 = sha256_file(core_file)
+            if stat_key(os.stat(core_file)) != stat_key(st):
+                return
+            env = _referenced_env_vars(core_file) if self._resolve_env_vars else {}
+        except OSError:
+            return
+
+        entry = {
+            "stat": self._trusted_stat_key(st),
+            "sha256": sha256,
+            "env": env,
+            "data": capi_data,
+        }
+        self._write(self._entry_path(core_file), entry)
+
+    def _trusted_stat_key(self, st):
+        if is_racy(st):
+            return None
+        return stat_key(st)
+
+    def _write(self, entry_path, entry):
+        try:
+            utils.pickle_fwrite(entry_path, entry)
+        except OSError as e:
+            logger.debug(f"Failed to write parser cache entry {entry_path}: {e}")
@@ -2,9 +2,19 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import hashlib
+import os
+
 import fastjsonschema
 
 from fusesoc import utils
+from fusesoc.capi2 import exprs
+from fusesoc.parser.cache import ParseCache
+
+try:
+    from fusesoc.version import version as __version__
+except ImportError:
+    __version__ = "unknown"
 
 
 class CoreParser:
@@ -15,6 +25,7 @@ class CoreParser:
         version,
         resolve_env_vars=False,
         allow_additional_properties=False,
+        cache_root=None,
     ):
         self._preamble = preamble
         self._schema = schema
@@ -32,6 +43,24 @@ class CoreParser:
         except fastjsonschema.JsonSchemaDefinitionException as e:
             raise SyntaxError(f"\nError parsing JSON Schema: {e}")
 
+        self._cache = None
+        if cache_root:
+            self._cache = ParseCache(cache_root, self.get_cache_key(), resolve_env_vars)
+            exprs.load_ast_cache(os.path.join(self._cache.cache_dir, "exprs"))
+
+    def get_cache_key(self):
+        """Identify everything besides the core file that affects read()"""
+        h = hashlib.sha256()
+        for item in [
+            __version__,
+            self._preamble,
+            self._schema,
+            self._resolve_env_vars,
+            self._allow_additional_properties,
+        ]:
+            h.update(str(item).encode() + b"\0")
+        return h.hexdigest()[:16]
+
     def _set_additional_properties(self, schema, val):
         if isinstance(schema, list):
             for i in schema:
@@ -46,13 +75,29 @@ class CoreParser:
                     self._set_additional_properties(v, val)
 
     def read(self, core_file, validate_core=True):
+        use_cache = self._cache and validate_core
+        if use_cache:
+            capi_data = self._cache.load(core_file)
+            if capi_data is not None:
+                return capi_data
+            st = os.stat(core_file)
+
         capi_data = utils.yaml_fread(core_file, self._resolve_env_vars, True)
 
         if validate_core:
             self.validate(capi_data)
 
+        if use_cache:
+            self._cache.store(core_file, capi_data, st)
+
         return capi_data
 
+    def read_cached(self, core_file):
+        """Return the cached contents of core_file, or None if not cached"""
+        if self._cache:
+            return self._cache.load(core_file)
+        return None
+
     def write(self, core_file, capi_data, validate_core=True):
         if validate_core:
             self.validate(capi_data)
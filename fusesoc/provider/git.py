@@ -2,16 +2,25 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import hashlib
 import logging
+import os
+import re
+import shutil
 import subprocess
+import tempfile
 
 from fusesoc.provider.provider import Provider
-from fusesoc.utils import Launcher
+from fusesoc.utils import Launcher, file_lock
 
 logger = logging.getLogger(__name__)
 
 
 class Git(Provider):
+    # SHAs of the revisions that have been fetched into a mirror by this
+    # process
+    _fetched_revisions = {}
+
     @staticmethod
     def _checkout_library_version(library):
         git_args = ["-C", library.location, "checkout", "-q", library.sync_version]
@@ -44,29 +53,132 @@ class Git(Provider):
         except subprocess.CalledProcessError as e:
             raise RuntimeError(str(e))
 
+    @staticmethod
+    def _resolve(git_dir, version):
+        """Return the SHA of the commit at version in git_dir, or None"""
+        args = ["git", "-C", git_dir, "rev-parse", "-q", "--verify"]
+        result = subprocess.run(
+            args + [version + "^{commit}"], stdout=subprocess.PIPE, text=True
+        )
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def _update_mirror(self, repo, version=None):
+        """Fetch a revision of repo into its mirror in the cache root
+
+        The mirror is a bare repository in cache_root/git-mirrors. Only the
+        commits that are checked out are fetched into it, without any
+        history, so a revision that is used by many cores is only downloaded
+        once. A version that is a full commit SHA already in the mirror is
+        used without contacting the repository. Other versions, and the
+        default branch when there is no version, are fetched at most once per
+        process. Returns the path to the mirror and the SHA of the revision.
+        """
+        mirror_root = os.path.join(self.cache_root, "git-mirrors")
+        mirror = os.path.join(mirror_root, hashlib.sha256(repo.encode()).hexdigest())
+        rev = version or "HEAD"
+
+        with file_lock(mirror + ".lock"):
+            if not os.path.isdir(mirror):
+                logger.info(f"Creating mirror of {repo}")
+                tmp = tempfile.mkdtemp(dir=mirror_root, prefix=".tmp-")
+                try:
+                    Launcher("git", ["init", "-q", "--bare", tmp]).run()
+                    for key, value in [
+                        # The fetched commits are not on any branch, so they
+                        # must never be garbage collected
+                        ("gc.auto", "0"),
+                        ("gc.pruneExpire", "never"),
+                        # Cores are fetched from the mirror by their SHA
+                        ("uploadpack.allowAnySHA1InWant", "true"),
+                        ("uploadpack.allowFilter", "true"),
+                    ]:
+                        Launcher("git", ["-C", tmp, "config", key, value]).run()
+                    os.rename(tmp, mirror)
+                except BaseException:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    raise
+
+            sha = Git._fetched_revisions.get((mirror, rev))
+            if (
+                not sha
+                and version
+                and re.fullmatch("[0-9a-f]{40}|[0-9a-f]{64}", version)
+            ):
+                sha = self._resolve(mirror, version)
+            if not sha:
+                logger.info(f"Fetching {rev} into mirror of {repo}")
+                args = ["-C", mirror, "fetch", "-q", "--depth", "1", repo, rev]
+                Launcher("git", args).run()
+                sha = self._resolve(mirror, "FETCH_HEAD")
+            Git._fetched_revisions[(mirror, rev)] = sha
+        return mirror, sha
+
+    def _fetch_revision(self, repo, version, local_dir, sparse):
+        """Fetch only the commit at version, without any history"""
+        Launcher("git", ["init", "-q", local_dir]).run()
+        Launcher("git", ["-C", local_dir, "remote", "add", "origin", repo]).run()
+        args = ["-C", local_dir, "fetch", "-q", "--depth", "1"]
+        if sparse:
+            self._sparse_checkout(local_dir, sparse)
+            # Only download the files that are checked out, if the server
+            # supports it
+            args.append("--filter=blob:none")
+        Launcher("git", args + ["origin", version]).run()
+        Launcher("git", ["-C", local_dir, "checkout", "-q", "FETCH_HEAD"]).run()
+
+    @staticmethod
+    def _sparse_checkout(local_dir, sparse):
+        args = ["-C", local_dir, "sparse-checkout", "set", "--no-cone"]
+        Launcher("git", args + sparse).run()
+
     def _checkout(self, local_dir):
         version = self.config.get("version", None)
+        sparse = self.config.get("sparse", [])
 
         # TODO : Sanitize URL
         repo = self.config.get("repo")
         logger.info("Checking out " + repo + " to " + local_dir)
+
+        if self.cache_root:
+            try:
+                mirror, sha = self._update_mirror(repo, version)
+                self._fetch_revision(mirror, sha, local_dir, sparse)
+                args = ["-C", local_dir, "remote", "set-url", "origin", repo]
+                Launcher("git", args).run()
+                return
+            except RuntimeError as e:
+                logger.warning(f"Failed to mirror {repo}, cloning it instead: {e}")
+                shutil.rmtree(local_dir, ignore_errors=True)
+        if version:
+            try:
+                self._fetch_revision(repo, version, local_dir, sparse)
+                return
+            except RuntimeError as e:
+                # Not all servers allow fetching a commit by its SHA
+                logger.info(f"Failed to fetch {version} from {repo}: {e}")
+                shutil.rmtree(local_dir, ignore_errors=True)
+
+        clone_args = ["clone", "-q"]
+        if sparse:
+            clone_args.append("--no-checkout")
+        # A shallow clone might not contain an older version
+        self._clone(clone_args, repo, local_dir, shallow=not version)
+
+        if sparse:
+            self._sparse_checkout(local_dir, sparse)
+        if version or sparse:
+            args = ["-C", local_dir, "checkout", "-q"]
+            Launcher("git", args + ([version] if version else [])).run()
+
+    def _clone(self, clone_args, repo, local_dir, shallow=True):
+        args = ["--no-single-branch", repo, local_dir]
+        if not shallow:
+            Launcher("git", clone_args + args).run()
+            return
         try:
-            args = [
-                "clone",
-                "-q",
-                "--depth",
-                "1",
-                "--no-single-branch",
-                repo,
-                local_dir,
-            ]
-            Launcher("git", args).run()
+            Launcher("git", clone_args + ["--depth", "1"] + args).run()
         except RuntimeError as e:
             try:
-                args = ["clone", "-q", "--no-single-branch", repo, local_dir]
-                Launcher("git", args).run()
+                Launcher("git", clone_args + args).run()
             except Exception:
                 raise e
-        if version:
-            args = ["-C", local_dir, "checkout", "-q", version]
-            Launcher("git", args).run()
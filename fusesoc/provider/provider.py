@@ -18,10 +18,12 @@ def get_provider(name):
 
 
 class Provider:
-    def __init__(self, config, core_root, files_root):
+    def __init__(self, config, core_root, files_root, cache_root=None):
         self.config = config
         self.core_root = core_root
         self.files_root = files_root
+        # Providers may keep data shared between cores below cache_root
+        self.cache_root = cache_root
         self.cachable = config.get("cachable", "") is not False
         self.patches = config.get("patches", [])
 
@@ -2,11 +2,14 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import hashlib
+import http.client
 import logging
 import os.path
 import shutil
 import sys
 import tarfile
+import tempfile
 import zipfile
 
 if sys.version_info[0] >= 3:
@@ -17,12 +20,55 @@ else:
     from urllib2 import URLError
     from urllib2 import HTTPError
 
+from fusesoc.digest import sha256_file
 from fusesoc.provider.provider import Provider
+from fusesoc.utils import file_lock
 
 logger = logging.getLogger(__name__)
 
 _HAS_TAR_FILTER = hasattr(tarfile, "tar_filter")  # Requires Python 3.12
 
+_CHUNK_SIZE = 1 << 20
+
+# Zip files need random access, so they are downloaded to a temporary file,
+# which is kept in memory up to this size
+_SPOOL_SIZE = 64 << 20
+
+
+class _TeeReader:
+    """Read from a stream while hashing the data and optionally copying it to
+    a file"""
+
+    def __init__(self, stream, f=None):
+        self.stream = stream
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if self.f:
+            self.f.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self):
+        """Read the rest of the stream"""
+        while self.read(_CHUNK_SIZE):
+            pass
+
+
+class ChecksumError(RuntimeError):
+    pass
+
+
+class DownloadError(RuntimeError):
+    def __init__(self, msg, code=None):
+        super().__init__(msg)
+        # The HTTP status code, if the server responded with an error
+        self.code = code
+
 
 class Url(Provider):
     @staticmethod
@@ -46,30 +92,186 @@ class Url(Provider):
         logger.info("Downloading...")
         user_agent = self.config.get("user-agent")
         filetype = self.config.get("filetype")
+        sha256 = self.config.get("sha256")
+        context = None
         if not self.config.get("verify_cert", True):
             import ssl
 
-            ssl._create_default_https_context = ssl._create_unverified_context
+            context = ssl._create_unverified_context()
+
+        try:
+            if self.cache_root:
+                self._cached_checkout(
+                    url, local_dir, filetype, user_agent, sha256, context
+                )
+            else:
+                Url._download(url, local_dir, filetype, user_agent, sha256, context)
+        except BaseException:
+            # Don't leave a partially extracted core behind
+            shutil.rmtree(local_dir, ignore_errors=True)
+            raise
+
+    def _cached_checkout(self, url, local_dir, filetype, user_agent, sha256, context):
+        """Download url to the download cache, unless it is already there, and
+        extract it to local_dir
+
+        Downloads with a sha256 are stored by their checksum, and are shared
+        by all cores that use the same file. Other downloads are stored by
+        their URL and are only reused if the provider is cachable. Tar files
+        are extracted while they are downloaded. An interrupted download with
+        a sha256 is resumed by the next fetch.
+        """
+        if sha256:
+            name = "sha256-" + sha256.lower()
+        else:
+            name = "url-" + hashlib.sha256(url.encode()).hexdigest()
+        filename = os.path.join(self.cache_root, "downloads", name)
+        part = filename + ".part"
 
-        Url._download(url, local_dir, filetype, user_agent)
+        with file_lock(filename + ".lock"):
+            if os.path.isfile(filename) and (sha256 or self.cachable):
+                logger.info(f"Using cached download of {url}")
+            elif filetype == "tar" and not (sha256 and os.path.isfile(part)):
+                with open(part, "wb") as f:
+                    try:
+                        Url._stream_tar(url, local_dir, user_agent, sha256, context, f)
+                    except ChecksumError:
+                        os.remove(part)
+                        raise
+                os.replace(part, filename)
+                return
+            else:
+                Url._fetch(url, part, user_agent, sha256, context, resume=bool(sha256))
+                os.replace(part, filename)
+            Url._extract(url, filename, local_dir, filetype)
 
     @staticmethod
-    def _download(url, local_dir, filetype, user_agent=False):
-        if user_agent and sys.version_info[0] >= 3:
-            opener = urllib.build_opener()
-            opener.addheaders = [("User-agent", user_agent)]
-            urllib.install_opener(opener)
+    def _open(url, user_agent=None, context=None, offset=0):
+        headers = {}
+        if user_agent:
+            headers["User-agent"] = user_agent
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
         try:
-            (filename, headers) = urllib.urlretrieve(url)
+            return urllib.urlopen(urllib.Request(url, headers=headers), context=context)
         except (URLError, HTTPError) as e:
-            raise RuntimeError(f"Failed to download '{url}'. '{e.reason}'")
+            raise DownloadError(
+                f"Failed to download '{url}'. '{e.reason}'", getattr(e, "code", None)
+            )
+
+    @staticmethod
+    def _check_length(response, size):
+        length = response.headers.get("Content-Length")
+        if length and int(length) != size:
+            raise OSError(f"Got {size} of {length} bytes")
+
+    @staticmethod
+    def _verify(url, digest, sha256):
+        if sha256 and digest != sha256.lower():
+            raise ChecksumError(
+                f"Checksum mismatch for '{url}'. "
+                f"Expected sha256 {sha256}, got {digest}"
+            )
+
+    @staticmethod
+    def _fetch(url, filename, user_agent=None, sha256=None, context=None, resume=False):
+        """Download url to filename and verify its checksum
+
+        With resume, an existing filename is assumed to be the beginning of
+        the file and only the rest of it is requested from the server.
+        """
+        offset = os.path.getsize(filename) if resume and os.path.isfile(filename) else 0
+        try:
+            response = Url._open(url, user_agent, context, offset)
+        except DownloadError as e:
+            if not (offset and e.code == 416):
+                raise
+            # The partial file is not a prefix of the file on the server
+            os.remove(filename)
+            return Url._fetch(url, filename, user_agent, sha256, context)
+
+        try:
+            with response:
+                if offset and getattr(response, "status", None) == 206:
+                    logger.info(f"Resuming download of {url} at {offset} bytes")
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                with open(filename, mode) as f:
+                    start = f.tell()
+                    shutil.copyfileobj(response, f, _CHUNK_SIZE)
+                    size = f.tell() - start
+                Url._check_length(response, size)
+        except (OSError, http.client.HTTPException) as e:
+            raise RuntimeError(f"Failed to download '{url}'. '{e}'")
+
+        if sha256:
+            try:
+                Url._verify(url, sha256_file(filename), sha256)
+            except ChecksumError:
+                os.remove(filename)
+                raise
+
+    @staticmethod
+    def _stream_tar(url, local_dir, user_agent=None, sha256=None, context=None, f=None):
+        """Extract the tar file at url to local_dir while it is downloaded
+
+        The downloaded data is also written to f if it is given. The checksum
+        can only be verified after the files have been extracted.
+        """
+        response = Url._open(url, user_agent, context)
+        with response:
+            reader = _TeeReader(response, f)
+            try:
+                with tarfile.open(fileobj=reader, mode="r|*") as t:
+                    Url._extract_tar(t, local_dir)
+                # Trailing padding after the end of the archive
+                reader.drain()
+                Url._check_length(response, reader.size)
+            except (OSError, http.client.HTTPException, tarfile.TarError) as e:
+                raise RuntimeError(f"Failed to download '{url}'. '{e}'")
+        Url._verify(url, reader.sha256.hexdigest(), sha256)
+
+    @staticmethod
+    def _download(
+        url, local_dir, filetype, user_agent=False, sha256=None, context=None
+    ):
+        if filetype == "tar":
+            Url._stream_tar(url, local_dir, user_agent, sha256, context)
+        elif filetype == "zip":
+            with tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE) as f:
+                response = Url._open(url, user_agent, context)
+                with response:
+                    reader = _TeeReader(response, f)
+                    try:
+                        reader.drain()
+                        Url._check_length(response, reader.size)
+                    except (OSError, http.client.HTTPException) as e:
+                        raise RuntimeError(f"Failed to download '{url}'. '{e}'")
+                Url._verify(url, reader.sha256.hexdigest(), sha256)
+                with zipfile.ZipFile(f, "r") as z:
+                    z.extractall(local_dir)
+        else:
+            fd, filename = tempfile.mkstemp()
+            os.close(fd)
+            try:
+                Url._fetch(url, filename, user_agent, sha256, context)
+                Url._extract(url, filename, local_dir, filetype)
+            finally:
+                os.remove(filename)
 
+    @staticmethod
+    def _extract_tar(t, local_dir):
+        extraction_arguments = {"path": local_dir}
+        if _HAS_TAR_FILTER:
+            extraction_arguments["filter"] = "data"
+        t.extractall(**extraction_arguments)
+
+    @staticmethod
+    def _extract(url, filename, local_dir, filetype):
         if filetype == "tar":
-            t = tarfile.open(filename)
-            extraction_arguments = {"path": local_dir}
-            if _HAS_TAR_FILTER:
-                extraction_arguments["filter"] = "data"
-            t.extractall(**extraction_arguments)
+            with tarfile.open(filename) as t:
+                Url._extract_tar(t, local_dir)
         elif filetype == "zip":
             with zipfile.ZipFile(filename, "r") as z:
                 z.extractall(local_dir)
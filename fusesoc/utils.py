@@ -2,11 +2,16 @@
 # Licensed under the 2-Clause BSD License, see LICENSE for details.
 # SPDX-License-Identifier: BSD-2-Clause
 
+import copy
+import json
 import logging
 import os
+import pickle
 import subprocess
 import sys
+import tempfile
 import warnings
+from contextlib import contextmanager
 
 import yaml
 
@@ -162,15 +167,33 @@ def yaml_fread(filepath, resolve_env_vars=False, remove_preamble=False):
         return yaml_read(f.read(), resolve_env_vars)
 
 
+def _unshare(data):
+    """Copy all dicts and lists in data, so that none of them appears twice"""
+    if isinstance(data, dict):
+        return {k: _unshare(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_unshare(v) for v in data]
+    return data
+
+
 def yaml_read(data, resolve_env_vars=False):
     try:
-        data = Inheritance.yaml_merge_2_fusesoc_merge(data)
+        # Without any << there are no merge keys to handle
+        has_merge_keys = "<<" in data
+        if has_merge_keys:
+            data = Inheritance.yaml_merge_2_fusesoc_merge(data)
         capi_data = {}
         if resolve_env_vars:
             capi_data = yaml.load(os.path.expandvars(data), Loader=YamlLoader)
         else:
             capi_data = yaml.load(data, Loader=YamlLoader)
-        return Inheritance.elaborate_inheritance(capi_data)
+        # Aliases of the same anchor are loaded as the same object. Copy
+        # them, since the data is modified in place later on.
+        if "&" in data:
+            capi_data = _unshare(capi_data)
+        if has_merge_keys:
+            capi_data = Inheritance.elaborate_inheritance(capi_data)
+        return capi_data
     except (yaml.parser.ParserError, yaml.scanner.ScannerError) as e:
         raise SyntaxError(str(e))
 
@@ -179,6 +202,149 @@ def yaml_dump(data):
     return yaml.dump(data)
 
 
+def json_fwrite(filepath, content):
+    with open(filepath, "w") as f:
+        json.dump(content, f, indent=1)
+
+
+def json_fread(filepath):
+    with open(filepath) as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise SyntaxError(str(e))
+
+
+def pickle_fwrite(filepath, content):
+    """Atomically write content to filepath as a pickle
+
+    The data is written to a temporary file in the same directory which is then
+    renamed over filepath, so that concurrent readers never see a partially
+    written file.
+    """
+    dirname = os.path.dirname(filepath)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def pickle_fread(filepath):
+    """Read a pickle written by pickle_fwrite
+
+    Returns None if the file does not exist or can not be unpickled
+    """
+    try:
+        with open(filepath, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"Ignoring unreadable cache file {filepath}: {e}")
+        return None
+
+
+@contextmanager
+def file_lock(filepath, blocking=True, shared=False):
+    """Hold a lock on filepath, shared with other processes
+
+    The lock file is created if it does not exist. With shared=True, the lock
+    is a shared lock, which can be held by several processes at the same time
+    but not together with an exclusive lock. With blocking=False, the context
+    manager yields False instead of waiting if the lock is held by someone
+    else, and True otherwise. The holder of an exclusive lock may remove the
+    lock file. On platforms without fcntl, the lock always succeeds without
+    locking anything.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        flags |= fcntl.LOCK_NB
+    while True:
+        with open(filepath, "a") as f:
+            try:
+                fcntl.flock(f, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                # Try again if the file was removed while we were waiting
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(filepath)):
+                    yield True
+                    return
+            except FileNotFoundError:
+                pass
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f"'{type(self).__name__}' object is immutable")
+
+
+class FrozenDict(dict):
+    """A read-only dict
+
+    copy() and copy.deepcopy() return regular, mutable copies.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def copy(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {copy.deepcopy(k, memo): copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    """A read-only list
+
+    copy() and copy.deepcopy() return regular, mutable copies.
+    """
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = clear = extend = insert = pop = remove = reverse = sort = _immutable
+
+    def copy(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(i, memo) for i in self]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def freeze(data):
+    """Return a read-only version of nested dicts and lists"""
+    if isinstance(data, dict):
+        return FrozenDict((k, freeze(v)) for k, v in data.items())
+    if isinstance(data, list):
+        return FrozenList(freeze(i) for i in data)
+    return data
+
+
+for _dumper in {yaml.Dumper, yaml.SafeDumper, YamlDumper}:
+    _dumper.add_representer(FrozenDict, yaml.representer.SafeRepresenter.represent_dict)
+    _dumper.add_representer(FrozenList, yaml.representer.SafeRepresenter.represent_list)
+
+
 def merge_dict(d1, d2, concat_list_appends_only=False):
     for key, value in d2.items():
         if isinstance(value, dict):
@@ -190,3 +356,24 @@ def merge_dict(d1, d2, concat_list_appends_only=False):
         else:
             d1[key] = value
     return d1
+
+
+def merge_dict_inplace(d1, d2):
+    """Merge d2 into d1 like merge_dict, but extend the lists in d1 in place
+
+    Lists and dicts from d2 are copied the first time they are added to d1,
+    so d1 never shares them with d2 and can be extended without side effects.
+    This makes merging many dicts into the same dict linear in the total
+    length of the lists, instead of copying the lists on every merge.
+    """
+    for key, value in d2.items():
+        if isinstance(value, dict):
+            d1[key] = merge_dict_inplace(d1.get(key, {}), value)
+        elif isinstance(value, list):
+            if key in d1:
+                d1[key] += value
+            else:
+                d1[key] = list(value)
+        else:
+            d1[key] = value
+    return d1
@@ -175,6 +175,40 @@ def test_capi2_append():
     assert expected == result
 
 
+def test_capi2_memoized_sections():
+    import copy
+
+    import pytest
+
+    from fusesoc.capi2.coreparser import Core2Parser
+    from fusesoc.core import Core
+
+    core = Core(Core2Parser(), os.path.join(cores_dir, "files.core"))
+    coredata = core._coredata
+
+    # Flags that define the same set of flags share the expanded section
+    targets = coredata.get_targets({"is_toplevel": True, "target": "sim"})
+    assert coredata.get_targets({"target": "sim", "is_toplevel": True}) is targets
+    assert coredata.get_targets({"target": "sim", "tool": None}) is not targets
+
+    # The shared results can not be modified...
+    with pytest.raises(TypeError):
+        targets["new_target"] = {}
+    filesets = coredata.get_filesets({})
+    with pytest.raises(TypeError):
+        next(iter(filesets.values()))["files"].append("new_file")
+
+    # ...but a deep copy can
+    targets_copy = copy.deepcopy(targets)
+    targets_copy["new_target"] = {}
+    assert "new_target" not in coredata.get_targets({})
+
+    # Repeated calls return the same results
+    flags = {"is_toplevel": True}
+    assert core.get_files(flags) == core.get_files(flags)
+    assert core.get_scripts("root", flags) == core.get_scripts("root", flags)
+
+
 def test_capi2_get_depends():
     from fusesoc.capi2.coreparser import Core2Parser
     from fusesoc.core import Core
@@ -756,6 +790,42 @@ def test_core2parser():
     assert capi2_data == capi2_readback_data
 
 
+def test_core2parser_cache(tmp_path):
+    import shutil
+    from unittest import mock
+
+    from fusesoc.capi2.coreparser import Core2Parser
+
+    src = os.path.join(
+        tests_dir, "capi2_cores", "parser", "no_additional_properties.core"
+    )
+    core_file = str(tmp_path / "cached.core")
+    shutil.copy(src, core_file)
+    cache_root = str(tmp_path / "cache")
+
+    expected = Core2Parser().read(core_file)
+    assert Core2Parser(cache_root=cache_root).read(core_file) == expected
+
+    # A warm cache must not touch the YAML parser, even if the file was touched
+    os.utime(core_file, ns=(0, 0))
+    with mock.patch("fusesoc.utils.yaml_fread") as yaml_fread:
+        assert Core2Parser(cache_root=cache_root).read(core_file) == expected
+        assert Core2Parser(cache_root=cache_root).read(core_file) == expected
+    yaml_fread.assert_not_called()
+
+    # Parser options use separate cache namespaces
+    parser = Core2Parser(allow_additional_properties=True, cache_root=cache_root)
+    with mock.patch("fusesoc.utils.yaml_fread", return_value=expected) as yaml_fread:
+        parser.read(core_file)
+    yaml_fread.assert_called_once()
+
+    # Changed contents invalidate the entry
+    with open(core_file, "a") as f:
+        f.write("description: changed\n")
+    data = Core2Parser(cache_root=cache_root).read(core_file)
+    assert data["description"] == "changed"
+
+
 def test_syntax_error():
     from fusesoc.capi2.coreparser import Core2Parser
 
@@ -819,3 +889,76 @@ def test_inheritance():
 
     capi2_data = parser.read(core_file)
     assert expected == capi2_data
+
+
+def test_inheritance_merge_keys():
+    from fusesoc.capi2.inheritance import Inheritance
+
+    op = Inheritance.MERGE_OPERATOR
+    for capi, expected in [
+        ("a: 1\nb: <<c", "a: 1\nb: <<c"),
+        ("t:\n  <<: *d\n", f"t:\n  {op}: *d\n"),
+        ("t: {<<: *d}", f"t: {{{op}: *d}}"),
+        ("t: {a: {b: 1}, <<: *d}", f"t: {{a: {{b: 1}}, {op}: *d}}"),
+        ("t: {a: 1, <<: *d}", "t: {a: 1, <<: *d}"),
+        ("t: {a: [1], <<: *d}", "t: {a: [1], <<: *d}"),
+        ("t<<: {<<3: 1}", "t<<: {<<3: 1}"),
+    ]:
+        assert Inheritance.yaml_merge_2_fusesoc_merge(capi) == expected
+
+    # Only mappings that use inheritance are copied, and parents are not
+    # modified
+    default = {"filesets": ["a"], "tools": {"icarus": {}}}
+    other = {"filesets": ["b"]}
+    capi = {
+        "targets": {
+            "default": default,
+            "child": {op: default, "filesets_append": ["c"]},
+        },
+        "other": other,
+    }
+    elaborated = Inheritance.elaborate_inheritance(capi)
+    assert elaborated["targets"]["child"] == {
+        "filesets": ["a"],
+        "tools": {"icarus": {}},
+        "filesets_append": ["c"],
+    }
+    assert elaborated["targets"]["default"] is default
+    assert elaborated["other"] is other
+    assert default == {"filesets": ["a"], "tools": {"icarus": {}}}
+    assert op in capi["targets"]["child"]
+
+
+def test_inheritance_aliases(tmp_path):
+    from fusesoc.capi2.coreparser import Core2Parser
+    from fusesoc.core import Core
+
+    core_file = tmp_path / "alias.core"
+    core_file.write_text(
+        """CAPI=2:
+name: ::alias:0
+filesets:
+  rtl:
+    files: [a.v]
+    file_type: verilogSource
+targets:
+  default: &base
+    filesets_append: [rtl]
+  sim: *base
+  lint: *base
+"""
+    )
+    # Aliases of the same target are appended to separately
+    core = Core(Core2Parser(), str(core_file))
+    for target in ["default", "sim", "lint"]:
+        flags = {"is_toplevel": True, "target": target}
+        assert [f["name"] for f in core.get_files(flags)] == ["a.v"]
+
+    # Also when merge keys are used elsewhere in the file
+    core_file.write_text(
+        core_file.read_text() + "  synth:\n    <<: *base\n    toplevel: top\n"
+    )
+    core = Core(Core2Parser(), str(core_file))
+    for target in ["default", "sim", "lint", "synth"]:
+        flags = {"is_toplevel": True, "target": target}
+        assert [f["name"] for f in core.get_files(flags)] == ["a.v"]
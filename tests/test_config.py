@@ -175,3 +175,22 @@ def test_config_write():
 
     assert conf.build_root == "/tmp"
     os.remove(tcf.name)
+
+
+def test_config_jobs(tmp_path):
+    from argparse import Namespace
+
+    from fusesoc.main import args_to_config
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text("[main]\nfetch_jobs = 3\ngenerator_jobs = 0\n")
+    conf = Config(str(config_file))
+
+    assert conf.parse_jobs == 1
+    assert conf.fetch_jobs == 3
+    assert conf.generator_jobs == (os.cpu_count() or 1)
+
+    args = Namespace(verbose=False, fetch_jobs=None, library_jobs=2)
+    args_to_config(args, conf)
+    assert conf.fetch_jobs == 3
+    assert conf.library_jobs == 2
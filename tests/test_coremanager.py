@@ -733,3 +733,281 @@ def test_lockfile_no_file_create(caplog):
             "::used:1.1",
             "::dependencies-top:0",
         ]
+
+
+def test_parallel_parsing(caplog, tmp_path):
+    import logging
+    import os
+    import shutil
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreManager
+    from fusesoc.librarymanager import Library
+
+    tests_dir = os.path.dirname(__file__)
+    core_dir = str(tmp_path / "cores")
+    shutil.copytree(os.path.join(tests_dir, "capi2_cores", "misc"), core_dir)
+    shutil.copytree(
+        os.path.join(tests_dir, "capi2_cores", "override"),
+        os.path.join(core_dir, "override"),
+    )
+    with open(os.path.join(core_dir, "capi1.core"), "w") as f:
+        f.write("CAPI=1\n[main]\n")
+
+    def find_cores(parse_jobs, cache_root):
+        config_file = tmp_path / f"fusesoc-{parse_jobs}.conf"
+        config_file.write_text(
+            f"[main]\ncache_root = {cache_root}\nparse_jobs = {parse_jobs}\n"
+        )
+        cm = CoreManager(Config(str(config_file)))
+        caplog.clear()
+        with caplog.at_level(logging.WARNING):
+            cm.add_library(Library("cores", core_dir), [])
+        cores = [(str(c.name), c.core_file) for c in cm.get_cores().values()]
+        return cores, caplog.text
+
+    serial = find_cores(1, tmp_path / "cache1")
+    assert "syntax_error.core" in serial[1]
+    assert "Replacing ::basic:0 in" in serial[1]
+
+    # Cold and warm parser cache
+    assert find_cores(2, tmp_path / "cache2") == serial
+    assert find_cores(2, tmp_path / "cache2") == serial
+
+
+def test_lazy_cores(tmp_path):
+    import os
+    from unittest import mock
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreManager
+    from fusesoc.librarymanager import Library
+    from fusesoc.vlnv import Vlnv
+
+    core_dir = os.path.join(os.path.dirname(__file__), "capi2_cores")
+
+    def core_manager(lazy_cores):
+        config_file = tmp_path / f"fusesoc-{lazy_cores}.conf"
+        config_file.write_text(
+            f"[main]\ncache_root = {tmp_path / 'cache'}\nlazy_cores = {lazy_cores}\n"
+        )
+        cm = CoreManager(Config(str(config_file)))
+        cm.add_library(Library("cores", core_dir), [])
+        return cm
+
+    eager = core_manager(False).get_cores()
+    lazy_cm = core_manager(True)
+    lazy = lazy_cm.get_cores()
+    assert list(lazy) == list(eager)
+
+    for name, core in lazy.items():
+        assert core._loaded_coredata is None
+        assert core.get_description() == eager[name].get_description()
+        assert core.get_virtuals() == eager[name].get_virtuals()
+        assert core.files_root == eager[name].files_root
+        for target in ["default", "sim", "synth"]:
+            for flags in [
+                {},
+                {"is_toplevel": True, "target": target, "tool": "icarus"},
+            ]:
+                try:
+                    expected = eager[name].get_depends(flags)
+                except SyntaxError:
+                    continue
+                assert core.get_depends(flags) == expected
+        assert core._loaded_coredata is None
+
+    # Dependency resolution only needs the headers
+    top = Vlnv("::deptree-root")
+    lazy_cm.get_depends(top, {"is_toplevel": True})
+    assert all(core._loaded_coredata is None for core in lazy.values())
+
+    # Everything else parses the core file on demand
+    core = lazy[str(top)]
+    flags = {"is_toplevel": True}
+    assert core.get_files(flags) == eager[str(top)].get_files(flags)
+    assert core._loaded_coredata is not None
+
+    # With an up-to-date library index, only invalid core files are parsed
+    from fusesoc.parser.coreparser import CoreParser
+
+    with mock.patch.object(
+        CoreParser, "read", autospec=True, side_effect=CoreParser.read
+    ) as read:
+        assert list(core_manager(True).get_cores()) == list(eager)
+    parsed = sorted(os.path.basename(c.args[1]) for c in read.call_args_list)
+    assert parsed == [
+        "syntax_error.core",
+        "typecheck.core",
+        "with_additional_properties.core",
+    ]
+
+
+def test_solver_cache(caplog, tmp_path):
+    import logging
+    import os
+    import shutil
+    from unittest import mock
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreDB, CoreManager
+    from fusesoc.librarymanager import Library
+    from fusesoc.vlnv import Vlnv
+
+    core_dir = str(tmp_path / "cores")
+    shutil.copytree(
+        os.path.join(os.path.dirname(__file__), "capi2_cores", "virtual"), core_dir
+    )
+    # Core files that were just modified are not trusted by the cache
+    for f in os.listdir(core_dir):
+        os.utime(os.path.join(core_dir, f), (0, 0))
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(f"[main]\ncache_root = {tmp_path / 'cache'}\n")
+
+    def solve(top, flags):
+        cm = CoreManager(Config(str(config_file)))
+        cm.add_library(Library("virtual", core_dir), [])
+        caplog.clear()
+        with caplog.at_level(logging.DEBUG, logger="fusesoc.coremanager"):
+            deps = cm.get_depends(Vlnv(top), flags)
+        return [(str(c.name), c.direct_deps) for c in deps], caplog.text
+
+    flags = {"is_toplevel": True}
+    deps, log = solve("::top_non_deterministic", flags)
+    assert "Solver cache miss" in log
+    assert "Non-deterministic selection of virtual core" in log
+
+    # A new run gives the same solution and warnings without running the solver
+    with mock.patch.object(CoreDB, "_run_solver", side_effect=AssertionError):
+        cached_deps, log = solve("::top_non_deterministic", flags)
+    assert cached_deps == deps
+    assert "Solver cache hit" in log
+    assert "Non-deterministic selection of virtual core" in log
+
+    # Different flags and modified core files are cache misses
+    assert "Solver cache miss" in solve("::top_non_deterministic", {})[1]
+    core_file = os.path.join(core_dir, "top_non_deterministic.core")
+    with open(core_file, "a") as f:
+        f.write("\n")
+    os.utime(core_file, (1, 1))
+    assert "Solver cache miss" in solve("::top_non_deterministic", flags)[1]
+
+
+def test_solver_packages(tmp_path):
+    import os
+    from unittest import mock
+
+    from fusesoc.capi2.core import Core
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreManager
+    from fusesoc.librarymanager import Library
+    from fusesoc.vlnv import Vlnv
+
+    tests_dir = os.path.dirname(__file__)
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(
+        f"[main]\ncache_root = {tmp_path / 'cache'}\nsolver_cache = false\n"
+    )
+    cm = CoreManager(Config(str(config_file)))
+    cm.add_library(
+        Library("deptree", os.path.join(tests_dir, "capi2_cores", "deptree")), []
+    )
+    cm.add_library(Library("misc", os.path.join(tests_dir, "capi2_cores", "misc")), [])
+
+    def solve(top):
+        with mock.patch.object(
+            Core, "get_depends", autospec=True, side_effect=Core.get_depends
+        ) as get_depends:
+            deps = cm.get_depends(Vlnv(top), {"tool": "icarus"})
+        return [str(c.name) for c in deps], [
+            str(c.args[0].name) for c in get_depends.call_args_list
+        ]
+
+    # Only the cores that can be reached from the toplevel core are queried
+    deps, queried = solve("::deptree-root")
+    assert sorted(queried) == sorted(deps)
+    assert "::deptree-child3:0" in deps
+
+    # Packages are reused for cores that are not the toplevel core
+    deps, queried = solve("::deptree-child1")
+    assert deps == ["::deptree-child3:0", "::deptree-child1:0"]
+    assert queried == ["::deptree-child1:0"]
+
+    # Adding a core only invalidates the package for that core
+    child3 = cm.get_core(Vlnv("::deptree-child3"))
+    cm.db.add(child3, Library("deptree", child3.core_root))
+    deps, queried = solve("::deptree-child1")
+    assert deps == ["::deptree-child3:0", "::deptree-child1:0"]
+    assert queried == ["::deptree-child3:0"]
+
+
+def test_find_indexed(tmp_path):
+    from unittest import mock
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreDB, CoreManager, DependencyError
+    from fusesoc.librarymanager import Library
+    from fusesoc.vlnv import Vlnv
+
+    core_dir = tmp_path / "cores"
+    core_dir.mkdir()
+    for i, name in enumerate(
+        [
+            "acme:lib:Foo:1.0",
+            "acme:lib:Foo:1.2-r1",
+            "acme:lib:Foo:1.10",
+            "acme:lib:Foo:2.0",
+            "acme:other:foo:0.5",
+            "::impl1:0",
+            "::impl2:0",
+        ]
+    ):
+        virtual = '\nvirtual: ["::iface:0"]' if "impl" in name else ""
+        (core_dir / f"core{i}.core").write_text(f"CAPI=2:\nname: {name}{virtual}\n")
+
+    cm = CoreManager(Config())
+    cm.add_library(Library("cores", str(core_dir)), [])
+
+    assert cm.find_core_names("FOO") == ["acme:lib:Foo", "acme:other:foo"]
+    assert cm.find_core_names("impl1") == ["::impl1"]
+    assert cm.find_core_names("iface") == []
+
+    def solve(name):
+        return cm.db._solve(Vlnv(name), only_matching_vlnv=True)[-1]
+
+    for name in [
+        "acme:lib:Foo",
+        "acme:lib:Foo:1.2",
+        "acme:lib:Foo:1.2-r1",
+        ">=acme:lib:Foo:1.1",
+        "<acme:lib:Foo:1.10",
+        "<=acme:lib:Foo:1.10",
+        ">acme:lib:Foo:2.0",
+        "acme:other:foo",
+    ]:
+        with mock.patch.object(
+            CoreDB, "_solve", autospec=True, side_effect=CoreDB._solve
+        ) as s:
+            try:
+                found = str(cm.db.find(Vlnv(name)).name)
+            except DependencyError:
+                found = None
+        try:
+            expected = str(solve(name).name)
+        except DependencyError:
+            expected = None
+        assert found == expected, name
+        # The solver is only used when no core matches
+        assert s.called == (expected is None), name
+
+    # The solver does not accept ^ and ~ for the toplevel core
+    assert str(cm.get_core(Vlnv("^acme:lib:Foo:1.0")).name) == "acme:lib:Foo:1.10"
+    assert str(cm.get_core(Vlnv("~acme:lib:Foo:1.2")).name) == "acme:lib:Foo:1.2-r1"
+
+    # Virtual VLNVs are still resolved by the solver
+    with mock.patch.object(
+        CoreDB, "_solve", autospec=True, side_effect=CoreDB._solve
+    ) as s:
+        assert str(cm.get_core(Vlnv("::iface")).name) in ["::impl1:0", "::impl2:0"]
+    assert s.called
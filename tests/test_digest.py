@@ -0,0 +1,63 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+
+from fusesoc.digest import DigestCache, sha256_file
+
+
+def test_sha256_file(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    f = tmp_path / "data.bin"
+    f.write_bytes(data)
+    assert sha256_file(str(f)) == hashlib.sha256(data).hexdigest()
+
+
+def test_digest_cache(tmp_path):
+    cache_root = str(tmp_path / "cache")
+    f = tmp_path / "data.bin"
+    f.write_bytes(b"some data")
+    # Move the mtime out of the racy interval
+    os.utime(f, (0, 0))
+    expected = hashlib.sha256(b"some data").hexdigest()
+
+    with mock.patch("fusesoc.digest.sha256_file", wraps=sha256_file) as hashed:
+        assert DigestCache(cache_root).sha256(str(f)) == expected
+        assert hashed.call_count == 1
+
+        # Unchanged files are not read again, not even by a new cache instance
+        assert DigestCache(cache_root).sha256(str(f)) == expected
+        assert hashed.call_count == 1
+
+        # Changed files are
+        f.write_bytes(b"other data")
+        os.utime(f, (0, 1))
+        assert DigestCache(cache_root).sha256(str(f)) == (
+            hashlib.sha256(b"other data").hexdigest()
+        )
+        assert hashed.call_count == 2
+
+        # Recently modified files are always hashed
+        f.write_bytes(b"new data")
+        cache = DigestCache(cache_root)
+        for _ in range(2):
+            assert cache.sha256(str(f)) == hashlib.sha256(b"new data").hexdigest()
+        assert hashed.call_count == 4
+
+        # Without cache_root, digests are only remembered in memory
+        os.utime(f, (0, 2))
+        cache = DigestCache()
+        cache.sha256(str(f))
+        cache.sha256(str(f))
+        assert hashed.call_count == 5
+        assert not os.path.exists(os.path.join(str(tmp_path), "digest_cache"))
+
+
+def test_digest_cache_missing_file(tmp_path):
+    with pytest.raises(OSError):
+        DigestCache(str(tmp_path)).sha256(str(tmp_path / "missing"))
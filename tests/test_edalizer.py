@@ -282,7 +282,7 @@ def test_generators():
     assert core_root.is_dir()
     assert (
         core_root.name
-        == "generate-testgenerate_with_cache_0-616d6cf151dba72fcd893c08a8e18e6dba2b81ee25dec08c92e0177064dfc18c"
+        == "generate-testgenerate_with_cache_0-684eb79dada927e149782ed89302e0d7e1fe8c44a90cbd2e25dfcf1795610011"
     )
     shutil.rmtree(core.core_root, ignore_errors=True)
 
@@ -295,10 +295,251 @@ def test_generators():
     assert core_root.is_dir()
     assert (
         core_root.name
-        == "da265f9dccc9d9e64d059f677508f9550b403c99e6ce5df07c6fb1d711d0ee99"
-    )
-    assert (
-        core_root.parent.name
-        == "generate-testgenerate_with_file_cache_0-f3d9e1e462ef1f7113fafbacd62d6335dd684e69332f75498fb01bfaaa7c11ee"
+        == "generate-testgenerate_with_file_cache_0-7a428557c3678e2745ef7f86d7e5235b97e9da08f52b69db48edd1f4bcf09263"
     )
     shutil.rmtree(core.core_root, ignore_errors=True)
+
+
+def test_setup_cores_parallel(caplog, tmp_path):
+    import logging
+    import shutil
+    import threading
+    from unittest import mock
+
+    import pytest
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreManager
+    from fusesoc.edalizer import Edalizer
+    from fusesoc.librarymanager import Library
+    from fusesoc.provider.url import Url
+    from fusesoc.vlnv import Vlnv
+
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    core_dir = tmp_path / "cores"
+    core_dir.mkdir()
+    deps = []
+    for i in range(4):
+        (src_dir / f"dep{i}.v").write_text(f"module dep{i};\nendmodule\n")
+        (core_dir / f"dep{i}.core").write_text(
+            f"""CAPI=2:
+name: ::dep{i}:0
+provider:
+  name: url
+  url: {(src_dir / f"dep{i}.v").as_uri()}
+  filetype: simple
+"""
+        )
+        deps.append(f'"::dep{i}:0"')
+    (core_dir / "top.core").write_text(
+        f"""CAPI=2:
+name: ::top:0
+filesets:
+  rtl:
+    depend: [{", ".join(deps)}]
+targets:
+  default:
+    filesets: [rtl]
+"""
+    )
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(
+        f"[main]\ncache_root = {tmp_path / 'cache'}\nfetch_jobs = 4\n"
+    )
+    config = Config(str(config_file))
+    cm = CoreManager(config)
+    cm.add_library(Library("cores", str(core_dir)), [])
+
+    def edalizer():
+        return Edalizer(
+            toplevel=Vlnv("::top"),
+            flags={"tool": "icarus"},
+            core_manager=cm,
+            work_root=str(tmp_path / "work"),
+        )
+
+    # All cores are fetched at the same time
+    barrier = threading.Barrier(4, timeout=10)
+    checkout = Url._checkout
+
+    def parallel_checkout(self, local_dir):
+        barrier.wait()
+        checkout(self, local_dir)
+
+    with caplog.at_level(logging.INFO):
+        with mock.patch.object(Url, "_checkout", parallel_checkout):
+            edalizer().setup_cores()
+    for i in range(4):
+        assert (tmp_path / "cache" / f"dep{i}_0" / f"dep{i}.v").is_file()
+        assert f"Prepared ::dep{i}:0 (" in caplog.text
+    assert "(4/4)" in caplog.text
+    assert "Preparing ::top:0" in caplog.text
+
+    # The first error in dependency order is raised, even if other cores
+    # fail before it
+    dep3_failed = threading.Event()
+
+    def failing_checkout(self, local_dir):
+        if local_dir.endswith("dep1_0"):
+            dep3_failed.wait(10)
+            raise RuntimeError("dep1 failed")
+        if local_dir.endswith("dep3_0"):
+            dep3_failed.set()
+            raise RuntimeError("dep3 failed")
+        checkout(self, local_dir)
+
+    shutil.rmtree(tmp_path / "cache")
+    with mock.patch.object(Url, "_checkout", failing_checkout):
+        with pytest.raises(RuntimeError, match="dep1 failed"):
+            edalizer().setup_cores()
+    assert "Failed to prepare ::dep3:0: dep3 failed" in caplog.text
+    assert (tmp_path / "cache" / "dep2_0" / "dep2.v").is_file()
+
+
+def test_generators_parallel(tmp_path):
+    import threading
+    from pathlib import Path
+    from unittest import mock
+
+    from fusesoc.config import Config
+    from fusesoc.coremanager import CoreManager
+    from fusesoc.edalizer import Edalizer, Ttptttg
+    from fusesoc.librarymanager import Library
+    from fusesoc.vlnv import Vlnv
+
+    cores_dir = Path(__file__).parent / "capi2_cores" / "misc" / "generate"
+
+    def run(jobs):
+        build_root = tmp_path / str(jobs)
+        config_file = tmp_path / f"fusesoc{jobs}.conf"
+        config_file.write_text(
+            f"[main]\ncache_root = {build_root / 'cache'}\ngenerator_jobs = {jobs}\n"
+        )
+        cm = CoreManager(Config(str(config_file)))
+        cm.add_library(Library("edalizer", cores_dir), [])
+        edalizer = Edalizer(
+            toplevel=Vlnv("::generate"),
+            flags={"tool": "icarus"},
+            core_manager=cm,
+            work_root=build_root / "work",
+        )
+        edalizer.run()
+        for core in edalizer.edam["cores"].values():
+            core["core_file"] = Path(core["core_file"]).name
+        return [(str(c.name), getattr(c, "pos", None)) for c in edalizer.cores], (
+            edalizer.edam
+        )
+
+    # All five generators run at the same time
+    barrier = threading.Barrier(5, timeout=10)
+    _run = Ttptttg._run
+
+    def parallel_run(self, generator_cwd):
+        barrier.wait()
+        _run(self, generator_cwd)
+
+    with mock.patch.object(Ttptttg, "_run", parallel_run):
+        parallel = run(5)
+
+    assert parallel == run(1)
+
+
+def test_merge_dict_inplace():
+    import copy
+
+    from fusesoc.utils import merge_dict, merge_dict_inplace
+
+    deps = ["::b:0"]
+    snippets = [
+        {
+            "dependencies": {"::a:0": deps},
+            "files": [{"name": "a.v"}],
+            "parameters": {"width": {"default": 8}},
+            "vpi": [],
+        },
+        {
+            "dependencies": {"::b:0": []},
+            "files": [{"name": "b.v"}, {"name": "c.v"}],
+            "parameters": {"width": {"default": 16}},
+            "vpi": [{"name": "vpi_b"}],
+        },
+        {"files": [{"name": "d.v"}], "hooks": {"pre_build": ["script"]}},
+    ]
+
+    expected = {"name": "top"}
+    for snippet in copy.deepcopy(snippets):
+        merge_dict(expected, snippet)
+
+    edam = {"name": "top"}
+    for snippet in snippets:
+        merge_dict_inplace(edam, snippet)
+
+    assert edam == expected
+    # Lists from the merged dicts are copied, not extended in place
+    assert deps == ["::b:0"]
+    assert snippets[0]["files"] == [{"name": "a.v"}]
+    assert edam["dependencies"]["::a:0"] is not deps
+
+
+def test_edam_formats(tmp_path):
+    import json
+    import os
+    from unittest import mock
+
+    from fusesoc.config import Config
+    from fusesoc.fusesoc import Fusesoc
+    from fusesoc.utils import yaml_fread
+
+    cores_dir = tmp_path / "cores"
+    cores_dir.mkdir()
+    (cores_dir / "top.v").write_text("module top; endmodule\n")
+    (cores_dir / "top.core").write_text(
+        """CAPI=2:
+name: ::top:0
+filesets:
+  rtl:
+    files: [top.v]
+    file_type: verilogSource
+targets:
+  sim:
+    flow: sim
+    flow_options:
+      tool: icarus
+    filesets: [rtl]
+    toplevel: top
+"""
+    )
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(
+        f"[main]\ncores_root = {cores_dir}\ncache_root = {tmp_path / 'cache'}\n"
+        + f"build_root = {tmp_path / 'build'}\nrun_fingerprint = false\n"
+    )
+
+    edams = {}
+    for edam_format in ["yaml", "json"]:
+        config = Config(str(config_file))
+        config.args_edam_format = edam_format
+        fs = Fusesoc(config)
+        core = fs.get_core("::top")
+        flags = dict(core.get_flags("sim"), target="sim")
+
+        edam_file, backend = fs.get_backend(core, flags)
+        assert edam_file.endswith(".eda.yml" if edam_format == "yaml" else ".eda.json")
+        mtime = os.path.getmtime(edam_file)
+
+        # An unchanged EDAM is detected from its hash without reading the file
+        with mock.patch.object(Fusesoc, "_read_edam") as read_edam:
+            assert fs.get_backend(core, flags)[0] == edam_file
+        read_edam.assert_not_called()
+        assert os.path.getmtime(edam_file) == mtime
+
+        if edam_format == "yaml":
+            edams[edam_format] = yaml_fread(edam_file)
+        else:
+            with open(edam_file) as f:
+                edams[edam_format] = json.load(f)
+
+    assert edams["yaml"] == edams["json"]
@@ -0,0 +1,129 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+from unittest import mock
+
+from fusesoc.export import ExportManifest
+
+
+def _export(src_dir, dst_dir, files):
+    manifest = ExportManifest(dst_dir)
+    for f in files:
+        manifest.export(os.path.join(src_dir, f), f)
+    manifest.finish()
+
+
+def _files(path):
+    result = []
+    for root, dirs, files in os.walk(path):
+        result += [os.path.relpath(os.path.join(root, f), path) for f in files]
+    return sorted(result)
+
+
+def test_export_manifest(tmp_path):
+    src_dir = tmp_path / "src"
+    dst_dir = tmp_path / "export" / "core"
+    for f in ["a.v", "b.v", "sub/c.v", "tree/d.v", "tree/e/f.v"]:
+        (src_dir / f).parent.mkdir(parents=True, exist_ok=True)
+        (src_dir / f).write_text(f)
+        os.utime(src_dir / f, (0, 0))
+
+    _export(src_dir, dst_dir, ["a.v", "b.v", "sub/c.v", "tree"])
+    assert _files(dst_dir) == ["a.v", "b.v", "sub/c.v", "tree/d.v", "tree/e/f.v"]
+    # The manifest is not part of the exported files
+    manifest_file = tmp_path / "export" / ".core.manifest"
+    assert manifest_file.is_file()
+
+    # Unchanged files are neither compared nor copied
+    with mock.patch("fusesoc.export.cmp") as cmp, mock.patch(
+        "fusesoc.export.shutil.copy2"
+    ) as copy2:
+        _export(src_dir, dst_dir, ["a.v", "b.v", "sub/c.v", "tree"])
+    cmp.assert_not_called()
+    copy2.assert_not_called()
+
+    # Changed sources and destinations are updated, removed files are
+    # cleaned out
+    (src_dir / "a.v").write_text("new a")
+    (dst_dir / "sub" / "c.v").write_text("modified")
+    with mock.patch("fusesoc.export.os.walk", wraps=os.walk) as walk:
+        _export(src_dir, dst_dir, ["a.v", "sub/c.v"])
+    walk.assert_not_called()
+    assert _files(dst_dir) == ["a.v", "sub/c.v"]
+    assert (dst_dir / "a.v").read_text() == "new a"
+    assert (dst_dir / "sub" / "c.v").read_text() == "sub/c.v"
+
+    # Without a manifest, leftover files are found by searching the
+    # destination
+    os.remove(manifest_file)
+    (dst_dir / "unknown.v").write_text("unknown")
+    _export(src_dir, dst_dir, ["a.v"])
+    assert _files(dst_dir) == ["a.v"]
+
+
+def test_export_modes(tmp_path):
+    import errno
+    import shutil
+
+    import pytest
+
+    from fusesoc import utils
+
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    (src_dir / "a.v").write_text("a")
+    os.utime(src_dir / "a.v", (0, 0))
+    dst_dir = tmp_path / "export" / "core"
+    manifest_file = tmp_path / "export" / ".core.manifest"
+
+    def export(mode):
+        manifest = ExportManifest(dst_dir, mode)
+        manifest.export(str(src_dir / "a.v"), "a.v")
+        manifest.finish()
+        return utils.pickle_fread(str(manifest_file))
+
+    manifest = export("hardlink")
+    assert manifest["mode"] == "hardlink"
+    assert manifest["files"]["a.v"]["mode"] == "hardlink"
+    assert os.path.samefile(src_dir / "a.v", dst_dir / "a.v")
+
+    manifest = export("symlink")
+    assert manifest["files"]["a.v"]["mode"] == "symlink"
+    assert os.readlink(dst_dir / "a.v") == str(src_dir / "a.v")
+
+    # Links are replaced, never written through
+    manifest = export("copy")
+    assert manifest["files"]["a.v"]["mode"] == "copy"
+    assert not os.path.islink(dst_dir / "a.v")
+    assert not os.path.samefile(src_dir / "a.v", dst_dir / "a.v")
+    assert (src_dir / "a.v").read_text() == "a"
+
+    # Reflinks are not supported by all file systems
+    manifest = export("reflink")
+    assert manifest["files"]["a.v"]["mode"] in ["copy", "reflink"]
+    assert (dst_dir / "a.v").read_text() == "a"
+
+    # An up to date plain copy is not reported as a reflink
+    os.remove(manifest_file)
+    os.remove(dst_dir / "a.v")
+    shutil.copy2(src_dir / "a.v", dst_dir / "a.v")
+    manifest = export("reflink")
+    assert manifest["files"]["a.v"]["mode"] == "copy"
+    os.remove(manifest_file)
+    with mock.patch("fusesoc.export._is_reflink", return_value=True):
+        manifest = export("reflink")
+    assert manifest["files"]["a.v"]["mode"] == "reflink"
+
+    # Hardlinks can not be created across file systems
+    os.remove(dst_dir / "a.v")
+    cross_device = OSError(errno.EXDEV, "Invalid cross-device link")
+    with mock.patch("fusesoc.export.os.link", side_effect=cross_device):
+        manifest = export("hardlink")
+    assert manifest["files"]["a.v"]["mode"] == "copy"
+    assert (dst_dir / "a.v").read_text() == "a"
+    assert not os.path.samefile(src_dir / "a.v", dst_dir / "a.v")
+
+    with pytest.raises(RuntimeError, match="Unknown export mode 'move'"):
+        ExportManifest(dst_dir, "move")
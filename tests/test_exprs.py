@@ -52,3 +52,84 @@ def test_expand():
     check_expand("mode_foo ? (a)", {"mode": "bar"}, "")
     check_expand("!mode_foo ? (a)", {"mode": "foo"}, "")
     check_expand("!mode_foo ? (a)", {"mode": "bar"}, "a")
+
+
+def test_ast_cache(tmp_path):
+    from fusesoc.capi2 import exprs
+
+    exprs.clear_ast_cache()
+    assert Exprs("a ? (b)").ast is Exprs("a ? (b)").ast
+    stats = exprs.ast_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+    # Parse errors are not cached
+    check_parse_error("a ? b")
+    check_parse_error("a ? b")
+    assert exprs.ast_cache_stats()["misses"] == 3
+
+    # The least recently used entry is evicted
+    old_size = exprs.ast_cache_stats()["maxsize"]
+    exprs.set_ast_cache_size(2)
+    try:
+        Exprs("c ? (d)")
+        Exprs("a ? (b)")
+        Exprs("e ? (f)")
+        assert list(exprs._AST_CACHE) == ["a ? (b)", "e ? (f)"]
+        assert exprs.ast_cache_stats()["evictions"] == 1
+    finally:
+        exprs.set_ast_cache_size(old_size)
+
+    # Round trip through a cache file
+    cache_file = str(tmp_path / "exprs")
+    exprs.save_ast_cache(cache_file)
+    exprs.clear_ast_cache()
+    exprs.load_ast_cache(cache_file)
+    check_parses_to("e ? (f)", [(False, "e", ["f"])])
+    assert exprs.ast_cache_stats()["hits"] == 1
+    assert exprs.ast_cache_stats()["misses"] == 0
+
+
+def test_parser_matches_pyparsing():
+    import random
+
+    from fusesoc.capi2.exprs import _parse, _pyparsing_parse
+
+    def reference(string):
+        try:
+            return _pyparsing_parse(string)
+        except ValueError:
+            return ValueError
+
+    def parse(string):
+        try:
+            return _parse(string)
+        except ValueError as e:
+            assert "Invalid syntax for string:" in str(e)
+            return ValueError
+
+    tokens = ["a", "b_c", "x.v", "!", "?", "(", ")", " ", "  ", "\t", "@", '"']
+    rng = random.Random(0)
+    strings = [
+        "",
+        " ",
+        "a ? (b) c",
+        "! a ? ( b )",
+        "a?(b)",
+        "a ? (b ? (c d) e) f",
+        "!a ? (b)!c ? (d)",
+        "a ? ()",
+        "a ? (b))",
+    ]
+    for _ in range(2000):
+        strings.append("".join(rng.choice(tokens) for _ in range(rng.randint(1, 12))))
+
+    # Make sure the random strings include plenty of valid conditionals
+    for _ in range(500):
+        s = "a"
+        for _ in range(rng.randint(1, 4)):
+            s = rng.choice(["", "!"]) + rng.choice(tokens[:3]) + " ? (" + s + ")"
+            s = rng.choice(["", "b ", "c "]) + s + rng.choice(["", " d"])
+        strings.append(s)
+
+    for string in strings:
+        assert parse(string) == reference(string), string
@@ -0,0 +1,214 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import time
+
+
+def _write(path, data, age=10):
+    path.write_text(data)
+    t = time.time() - age
+    os.utime(path, (t, t))
+    return str(path)
+
+
+def test_run_fingerprint(tmp_path):
+    from fusesoc.fingerprint import RunFingerprint
+
+    fingerprint_file = str(tmp_path / "top.fingerprint")
+    src = _write(tmp_path / "src.v", "module a;")
+    dst = _write(tmp_path / "dst.v", "module a;")
+
+    fingerprint = RunFingerprint(fingerprint_file, ["flags", {"tool": "icarus"}])
+    assert not fingerprint.is_current()
+    fingerprint.store([src], [dst])
+    assert fingerprint.is_current()
+
+    # Another key, e.g. other flags
+    assert not RunFingerprint(fingerprint_file, ["flags", {}]).is_current()
+
+    # A modified output file
+    _write(tmp_path / "dst.v", "module b;")
+    assert not fingerprint.is_current()
+
+    fingerprint.store([src], [dst])
+    assert fingerprint.is_current()
+    fingerprint.invalidate()
+    assert not os.path.exists(fingerprint_file)
+
+    # Input files that were modified very recently are not trusted
+    _write(tmp_path / "src.v", "module b;", age=0)
+    fingerprint.store([src], [dst])
+    assert not fingerprint.is_current()
+
+    # A missing input file
+    _write(tmp_path / "src.v", "module b;")
+    fingerprint.store([src], [dst])
+    assert fingerprint.is_current()
+    os.remove(src)
+    assert not fingerprint.is_current()
+
+
+def test_run_fingerprint_generator_file_inputs(caplog, tmp_path):
+    import logging
+
+    from fusesoc.config import Config
+    from fusesoc.fusesoc import Fusesoc
+
+    cores_dir = tmp_path / "cores"
+    cores_dir.mkdir()
+    _write(
+        cores_dir / "gen.py",
+        """import sys
+import yaml
+
+with open(sys.argv[1]) as f:
+    data = yaml.safe_load(f)
+with open(data["files_root"] + "/" + data["parameters"]["table"]) as f:
+    value = f.read().strip()
+with open("generated.core", "w") as f:
+    f.write(f'''CAPI=2:
+name: {data["vlnv"]}
+targets:
+  default:
+    parameters: [value]
+parameters:
+  value:
+    datatype: str
+    default: "{value}"
+    paramtype: vlogparam
+''')
+""",
+    )
+    _write(cores_dir / "table.txt", "first")
+    _write(
+        cores_dir / "top.core",
+        """CAPI=2:
+name: ::top:0
+generators:
+  gen:
+    interpreter: python3
+    command: gen.py
+    cache_type: input
+    file_input_parameters: table
+generate:
+  table:
+    generator: gen
+    parameters:
+      table: table.txt
+targets:
+  sim:
+    flow: sim
+    flow_options:
+      tool: icarus
+    generate: [table]
+    toplevel: top
+""",
+    )
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(
+        f"[main]\ncores_root = {cores_dir}\ncache_root = {tmp_path / 'cache'}\n"
+        + f"build_root = {tmp_path / 'build'}\n"
+    )
+    fs = Fusesoc(Config(str(config_file)))
+    core = fs.get_core("::top")
+    flags = dict(core.get_flags("sim"), target="sim")
+
+    t = time.time() - 10
+
+    def run():
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            edam = fs.get_backend(core, flags)[1].edam
+        # Generated cores are inputs too, and no fingerprint is stored
+        # while they are new
+        for root, dirs, files in os.walk(tmp_path / "cache" / "generator_cache"):
+            for f in files:
+                os.utime(os.path.join(root, f), (t, t))
+        return edam["parameters"]["value"]["default"]
+
+    assert run() == "first"
+    assert "Generating ::top-table:0" in caplog.text
+    assert run() == "first"
+    assert "Inputs are unchanged" not in caplog.text
+    assert run() == "first"
+    assert "Inputs are unchanged" in caplog.text
+
+    # A modified generator input file makes the generator run again
+    _write(cores_dir / "table.txt", "second", age=5)
+    assert run() == "second"
+    assert "Inputs are unchanged" not in caplog.text
+    assert "Generating ::top-table:0" in caplog.text
+
+
+def test_run_fingerprint_no_export_provider(caplog, tmp_path):
+    import logging
+    import shutil
+
+    from fusesoc.config import Config
+    from fusesoc.fusesoc import Fusesoc
+
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    _write(src_dir / "dep.v", "module dep;\nendmodule\n")
+    cores_dir = tmp_path / "cores"
+    cores_dir.mkdir()
+    _write(
+        cores_dir / "dep.core",
+        f"""CAPI=2:
+name: ::dep:0
+provider:
+  name: url
+  url: {(src_dir / "dep.v").as_uri()}
+  filetype: simple
+""",
+    )
+    _write(
+        cores_dir / "top.core",
+        """CAPI=2:
+name: ::top:0
+filesets:
+  rtl:
+    depend: ["::dep:0"]
+targets:
+  sim:
+    flow: sim
+    flow_options:
+      tool: icarus
+    filesets: [rtl]
+    toplevel: top
+""",
+    )
+
+    config_file = tmp_path / "fusesoc.conf"
+    config_file.write_text(
+        f"[main]\ncores_root = {cores_dir}\ncache_root = {tmp_path / 'cache'}\n"
+        + f"build_root = {tmp_path / 'build'}\nno_export = true\n"
+    )
+    fs = Fusesoc(Config(str(config_file)))
+    core = fs.get_core("::top")
+    flags = dict(core.get_flags("sim"), target="sim")
+    files_root = tmp_path / "cache" / "dep_0"
+
+    t = time.time() - 10
+
+    def run():
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            fs.get_backend(core, flags)
+        for root, dirs, files in os.walk(tmp_path / "build"):
+            for f in files:
+                os.utime(os.path.join(root, f), (t, t))
+
+    run()
+    assert (files_root / "dep.v").is_file()
+    run()
+
+    # The EDAM refers to the fetched files in the cache, so removing them
+    # makes the provider fetch them again
+    shutil.rmtree(files_root)
+    run()
+    assert "Inputs are unchanged" not in caplog.text
+    assert (files_root / "dep.v").is_file()
@@ -0,0 +1,129 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+import threading
+import time
+
+import pytest
+
+from fusesoc.generatorcache import GeneratorCache
+
+
+def _generate(size):
+    def generate(path):
+        with open(os.path.join(path, "out.v"), "w") as f:
+            f.write("x" * size)
+
+    return generate
+
+
+def test_generator_cache_add(tmp_path):
+    cache = GeneratorCache(str(tmp_path / "generator_cache"))
+    assert cache.get("a") is None
+
+    def failing_generate(path):
+        _generate(10)(path)
+        raise RuntimeError("Generator failed")
+
+    with pytest.raises(RuntimeError):
+        cache.add("a", failing_generate)
+    assert cache.get("a") is None
+    assert [f for f in os.listdir(cache.cache_dir) if f != ".locks"] == []
+
+    path = cache.add("a", _generate(10))
+    assert path == cache.get("a") == cache.path("a")
+    assert os.path.isfile(os.path.join(path, "out.v"))
+
+
+def test_generator_cache_concurrent_add(tmp_path):
+    cache_dir = str(tmp_path / "generator_cache")
+    runs = []
+    barrier = threading.Barrier(4, timeout=10)
+
+    def slow_generate(path):
+        runs.append(path)
+        assert not os.path.exists(os.path.join(cache_dir, "a"))
+        time.sleep(0.1)
+        _generate(10)(path)
+
+    def add():
+        barrier.wait()
+        # Each thread uses its own lock file handle, just like separate
+        # processes would
+        results.append(GeneratorCache(cache_dir).add("a", slow_generate))
+
+    results = []
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert results == [os.path.join(cache_dir, "a")] * 4
+
+
+def test_generator_cache_evict(tmp_path):
+    cache = GeneratorCache(str(tmp_path / "generator_cache"))
+    now = time.time()
+    for i, key in enumerate(["a", "b", "c", "d"]):
+        cache.add(key, _generate(1000))
+        # a was used 4 days ago, b 3 days ago and so on
+        os.utime(cache.path(key), (now, now - (4 - i) * 24 * 60 * 60))
+
+    stats = cache.stats()
+    assert stats["entries"] == 4
+    assert stats["size"] == 4000
+    assert stats["oldest"] == pytest.approx(now - 4 * 24 * 60 * 60)
+
+    # Entries that are in use are not removed
+    with cache.lock("a"):
+        assert cache.evict(max_age=2.5 * 24 * 60 * 60) == ["b"]
+    assert cache.evict(max_age=2.5 * 24 * 60 * 60) == ["a"]
+
+    # Using an entry makes it the most recently used one
+    cache.get("c")
+    assert cache.evict(max_size=1500) == ["d"]
+    assert cache.stats()["entries"] == 1
+    assert cache.get("c")
+    assert not [f for f in os.listdir(cache.cache_dir) if f.startswith(".tmp-")]
+
+
+def test_generator_cache_evict_keep(tmp_path):
+    cache = GeneratorCache(str(tmp_path / "generator_cache"))
+    cache.add("old", _generate(100))
+    cache.add("big", _generate(1000))
+
+    # Entries in use by the current build are kept, even when they alone
+    # are larger than max_size
+    assert cache.evict(max_size=500, keep={"big"}) == ["old"]
+    assert cache.get("big")
+    assert cache.evict(max_size=500, max_age=1e-9, keep={"big"}) == []
+    assert cache.get("big")
+    assert cache.evict(max_size=500) == ["big"]
+
+
+def test_generator_cache_use(tmp_path):
+    cache = GeneratorCache(str(tmp_path / "generator_cache"))
+    lock_dir = os.path.join(cache.cache_dir, ".locks")
+
+    def failing_generate(path):
+        raise RuntimeError("Generator failed")
+
+    with cache.use("a", _generate(10)) as (path, found):
+        assert not found
+        # Entries that are in use are not evicted
+        assert cache.evict(max_age=1e-9) == []
+        assert os.path.isfile(os.path.join(path, "out.v"))
+    with cache.use("a", failing_generate) as (path, found):
+        assert found
+
+    # Lock files are removed with their entries, and when the generator
+    # failed
+    with pytest.raises(RuntimeError):
+        cache.add("b", failing_generate)
+    assert sorted(os.listdir(lock_dir)) == ["a.lock", "b.lock"]
+    assert cache.evict(max_age=1e-9) == ["a"]
+    assert os.listdir(lock_dir) == []
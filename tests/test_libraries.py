@@ -21,6 +21,9 @@ EXAMPLE_CONFIG = """
 build_root = {build_root}
 cache_root = {cache_root}
 library_root = {library_root}
+parser_cache = false
+library_index = false
+solver_cache = false
 
 [library.test_lib]
 location = {cores_root}
@@ -239,3 +242,36 @@ auto-sync = true
         assert "vlog_tb_utils does not exist. Trying a checkout" in caplog.text
         assert f"Cloning library into {library}/vlog_tb_utils" in caplog.text
         assert "Updating..." in caplog.text
+
+
+def test_library_update_parallel(caplog, tmp_path):
+    from fusesoc.librarymanager import Library, LibraryManager
+
+    upstream = str(tmp_path / "upstream")
+    git = ["git", "-c", "user.name=x", "-c", "user.email=x@x"]
+    subprocess.check_call(git + ["init", "-q", upstream])
+    subprocess.check_call(
+        git + ["-C", upstream, "commit", "-q", "--allow-empty", "-m", "x"]
+    )
+
+    lm = LibraryManager(str(tmp_path))
+    for name in ["a", "b", "c"]:
+        lm.add_library(Library(name, str(tmp_path / name), "git", "file://" + upstream))
+    lm.add_library(
+        Library("broken", str(tmp_path / "broken"), "git", str(tmp_path / "missing"))
+    )
+    lm.add_library(Library("local", str(tmp_path / "local")))
+
+    with caplog.at_level(logging.INFO):
+        assert lm.update([], jobs=4) is False
+    for name in ["a", "b", "c"]:
+        assert os.path.isdir(str(tmp_path / name / ".git"))
+    assert "Updated 3 of 5 libraries" in caplog.text
+    assert "Failed to update libraries: broken" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        assert lm.update(["a", "b", "c"], jobs=4) is True
+    for name in ["a", "b", "c"]:
+        assert f"{name} : Updating..." in caplog.text
+    assert "Updated 3 of 3 libraries" in caplog.text
@@ -0,0 +1,83 @@
+# Copyright FuseSoC contributors
+# Licensed under the 2-Clause BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-2-Clause
+
+import os
+from unittest import mock
+
+from fusesoc.libraryindex import LibraryIndex
+
+
+def _walk_core_files(path, ignored_dirs):
+    """Reference implementation using os.walk"""
+    found = []
+    visited = set()
+    for root, dirs, files in os.walk(path, followlinks=True):
+        if "FUSESOC_IGNORE" in files or os.path.realpath(root) in ignored_dirs:
+            del dirs[:]
+            continue
+        keep_dirs = []
+        for _d in dirs:
+            if _d == ".git":
+                continue
+            st = os.stat(os.path.join(root, _d))
+            if (st.st_dev, st.st_ino) in visited:
+                continue
+            visited.add((st.st_dev, st.st_ino))
+            keep_dirs.append(_d)
+        dirs[:] = keep_dirs
+        found += [os.path.join(root, f) for f in files if f.endswith(".core")]
+    return found
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w"):
+        pass
+
+
+def _age(path):
+    """Move mtimes of path and all its subdirectories into the past"""
+    for root, dirs, files in os.walk(path):
+        os.utime(root, (0, 0))
+
+
+def test_library_index(tmp_path):
+    lib = str(tmp_path / "lib")
+    cache_root = str(tmp_path / "cache")
+    for f in ["a.core", "x/b.core", "x/y/c.core", "z/d.core", ".git/e.core"]:
+        _touch(os.path.join(lib, f))
+    _touch(os.path.join(lib, "x", "not_a_core.txt"))
+    os.symlink(lib, os.path.join(lib, "x", "loop"))
+    _age(lib)
+
+    index = LibraryIndex(lib, cache_root)
+    expected = _walk_core_files(lib, [])
+    assert index.find_core_files([]) == expected
+    # a.core is also found once through the symlink loop, just as with os.walk
+    assert len(expected) == 5
+    assert os.path.isfile(index.index_file)
+
+    # Unchanged directories are not listed again
+    with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+        assert LibraryIndex(lib, cache_root).find_core_files([]) == expected
+    scandir.assert_not_called()
+
+    # Changes deep down in the tree are detected
+    _touch(os.path.join(lib, "x", "y", "new.core"))
+    _touch(os.path.join(lib, "z", "FUSESOC_IGNORE"))
+    with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+        found = LibraryIndex(lib, cache_root).find_core_files([])
+    assert scandir.call_count == 2
+    assert found == _walk_core_files(lib, [])
+    assert os.path.join(lib, "x", "y", "new.core") in found
+    assert os.path.join(lib, "z", "d.core") not in found
+
+    ignored_dirs = [os.path.realpath(os.path.join(lib, "x"))]
+    found = LibraryIndex(lib, cache_root).find_core_files(ignored_dirs)
+    assert found == _walk_core_files(lib, ignored_dirs)
+
+    # A rescan lists everything again
+    with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+        LibraryIndex(lib, cache_root).find_core_files([], rescan=True)
+    assert scandir.call_count > 2
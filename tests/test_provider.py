@@ -117,3 +117,298 @@ def test_cachable():
     assert core.cache_status() == "empty"
     core.setup()
     assert core.cache_status() == "downloaded"
+
+
+def _git_upstream(path):
+    import subprocess
+
+    def git(*args):
+        subprocess.check_call(
+            ["git", "-c", "user.name=x", "-c", "user.email=x@x"] + list(args)
+        )
+
+    upstream = str(path)
+    git("init", "-q", "-b", "main", upstream)
+    for tag in ["v1", "v2"]:
+        os.makedirs(os.path.join(upstream, tag))
+        for f in ["version.txt", os.path.join(tag, "file.txt")]:
+            with open(os.path.join(upstream, f), "w") as fout:
+                fout.write(tag)
+        git("-C", upstream, "add", ".")
+        git("-C", upstream, "commit", "-q", "-m", tag)
+        git("-C", upstream, "tag", tag)
+    return git, upstream
+
+
+def _git_output(*args):
+    import subprocess
+
+    return subprocess.check_output(["git"] + list(args), text=True).strip()
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="Git not installed")
+def test_git_provider_mirror(tmp_path):
+    from fusesoc.provider.git import Git
+
+    git, upstream = _git_upstream(tmp_path / "upstream")
+    repo = "file://" + upstream
+
+    cache_root = str(tmp_path / "cache")
+    for name in ["core_a", "core_b"]:
+        config = {"name": "git", "repo": repo}
+        files_root = os.path.join(cache_root, name)
+        Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+
+        with open(os.path.join(files_root, "version.txt")) as f:
+            assert f.read() == "v2"
+        # Only the checked out commit is fetched
+        assert _git_output("-C", files_root, "rev-list", "--all", "--count") == "1"
+        assert _git_output("-C", files_root, "remote", "get-url", "origin") == repo
+
+    mirrors = os.listdir(os.path.join(cache_root, "git-mirrors"))
+    assert len([m for m in mirrors if not m.endswith(".lock")]) == 1
+    mirror = os.path.join(cache_root, "git-mirrors", mirrors[0].replace(".lock", ""))
+    assert _git_output("-C", mirror, "rev-parse", "--is-shallow-repository") == "true"
+
+    # New upstream commits are fetched into the mirror by the next process
+    with open(os.path.join(upstream, "version.txt"), "w") as f:
+        f.write("v3")
+    git("-C", upstream, "commit", "-q", "-a", "-m", "v3")
+    Git._fetched_revisions.clear()
+    files_root = os.path.join(cache_root, "core_c")
+    config = {"name": "git", "repo": repo}
+    Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+    with open(os.path.join(files_root, "version.txt")) as f:
+        assert f.read() == "v3"
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="Git not installed")
+def test_git_provider_revision(caplog, tmp_path, monkeypatch):
+    import logging
+
+    from fusesoc.provider.git import Git
+
+    git, upstream = _git_upstream(tmp_path / "upstream")
+    repo = "file://" + upstream
+    cache_root = str(tmp_path / "cache")
+    v1 = _git_output("-C", upstream, "rev-parse", "v1")
+
+    # Pinned versions are cloned from the mirror
+    Git._fetched_revisions.clear()
+    files_root = os.path.join(cache_root, "core_v1")
+    config = {"name": "git", "repo": repo, "version": v1}
+    Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+    assert _git_output("-C", files_root, "rev-parse", "HEAD") == v1
+    # Only the pinned commit is fetched into the mirror
+    mirror_root = os.path.join(cache_root, "git-mirrors")
+    (mirror,) = [m for m in os.listdir(mirror_root) if not m.endswith(".lock")]
+    mirror = os.path.join(mirror_root, mirror)
+    assert _git_output("-C", mirror, "rev-parse", "--is-shallow-repository") == "true"
+    assert _git_output("-C", mirror, "rev-list", "--count", v1) == "1"
+
+    # A commit that is already in the mirror is used without contacting the
+    # repository, even by the next process
+    os.rename(upstream, upstream + ".moved")
+    Git._fetched_revisions.clear()
+    files_root = os.path.join(cache_root, "core_v1_again")
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+    assert _git_output("-C", files_root, "rev-parse", "HEAD") == v1
+    assert "mirror" not in caplog.text
+    os.rename(upstream + ".moved", upstream)
+
+    # Sparse checkout
+    files_root = os.path.join(cache_root, "core_sparse")
+    config = {"name": "git", "repo": repo, "version": "v2", "sparse": ["/v2/"]}
+    Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+    assert sorted(os.listdir(files_root)) == [".git", "v2"]
+
+    # Commits that are not on any branch or tag are fetched into the mirror
+    git("-C", upstream, "checkout", "-q", "--detach")
+    git("-C", upstream, "commit", "-q", "--allow-empty", "-m", "detached")
+    detached = _git_output("-C", upstream, "rev-parse", "HEAD")
+    git("-C", upstream, "update-ref", "refs/other/detached", detached)
+    files_root = os.path.join(cache_root, "core_detached")
+    config = {"name": "git", "repo": repo, "version": detached}
+    Git(config, str(tmp_path), files_root, cache_root=cache_root).fetch()
+    assert _git_output("-C", files_root, "rev-parse", "HEAD") == detached
+
+    # Without a cache root, only the requested commit is fetched
+    files_root = str(tmp_path / "core_direct")
+    config = {"name": "git", "repo": repo, "version": v1}
+    Git(config, str(tmp_path), files_root).fetch()
+    assert _git_output("-C", files_root, "rev-parse", "HEAD") == v1
+    assert _git_output("-C", files_root, "rev-list", "--all", "--count") == "1"
+
+    # Fall back to a full clone when the server refuses to send an
+    # unadvertised commit, which only the old protocol does for file://
+    git("-C", upstream, "tag", "-d", "v1")
+    monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+    monkeypatch.setenv("GIT_CONFIG_KEY_0", "protocol.version")
+    monkeypatch.setenv("GIT_CONFIG_VALUE_0", "0")
+    files_root = str(tmp_path / "core_fallback")
+    config = {"name": "git", "repo": repo, "version": v1, "sparse": ["/v1/"]}
+    Git(config, str(tmp_path), files_root).fetch()
+    assert _git_output("-C", files_root, "rev-parse", "HEAD") == v1
+    assert sorted(os.listdir(files_root)) == [".git", "v1"]
+
+
+def test_url_provider_download_cache(tmp_path):
+    import hashlib
+    import http.server
+    import io
+    import tarfile
+    import threading
+
+    from fusesoc.provider.url import Url
+
+    # A tar file that is large enough to be read in several chunks
+    data = os.urandom(3 << 20)
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as t:
+        info = tarfile.TarInfo("ip/file.v")
+        info.size = len(data)
+        t.addfile(info, io.BytesIO(data))
+    archive = buf.getvalue()
+    sha256 = hashlib.sha256(archive).hexdigest()
+
+    requests = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            range_header = self.headers.get("Range")
+            requests.append(range_header)
+            if len(requests) == 2:
+                self.send_error(503)
+                return
+            start = int(range_header[6:-1]) if range_header else 0
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Length", str(len(archive) - start))
+            self.end_headers()
+            if len(requests) == 1:
+                # Drop the connection halfway through the first download
+                self.wfile.write(archive[: len(archive) // 2])
+            else:
+                self.wfile.write(archive[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/ip.tar"
+
+    cache_root = str(tmp_path / "cache")
+
+    def fetch(name, sha256=sha256):
+        config = {"name": "url", "url": url, "filetype": "tar", "sha256": sha256}
+        provider = Url(
+            config, str(tmp_path), os.path.join(cache_root, name), cache_root
+        )
+        provider.fetch()
+        return provider
+
+    try:
+        with pytest.raises(RuntimeError):
+            fetch("core_a")
+
+        # The partial download is kept when the server is unavailable
+        part = os.path.join(cache_root, "downloads", "sha256-" + sha256 + ".part")
+        with pytest.raises(RuntimeError, match="Service Unavailable"):
+            fetch("core_a")
+        assert os.path.getsize(part) == len(archive) // 2
+
+        # The interrupted download is resumed
+        provider = fetch("core_a")
+        assert requests[2] == f"bytes={len(archive) // 2}-"
+        with open(os.path.join(provider.files_root, "ip", "file.v"), "rb") as f:
+            assert f.read() == data
+
+        # Other cores and fetches after cleaning the cache reuse the download
+        fetch("core_b")
+        provider.clean_cache()
+        provider.fetch()
+        assert os.path.isfile(os.path.join(provider.files_root, "ip", "file.v"))
+        assert len(requests) == 3
+
+        with pytest.raises(RuntimeError, match="Checksum mismatch"):
+            fetch("core_c", sha256="0" * 64)
+        assert sorted(os.listdir(os.path.join(cache_root, "downloads"))) == [
+            "sha256-" + "0" * 64 + ".lock",
+            "sha256-" + sha256,
+            "sha256-" + sha256 + ".lock",
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_url_provider_streaming(tmp_path, monkeypatch):
+    import http.server
+    import io
+    import tarfile
+    import tempfile
+    import threading
+    import zipfile
+
+    from fusesoc.provider.url import Url
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as t:
+        info = tarfile.TarInfo("ip/file.v")
+        info.size = 6
+        t.addfile(info, io.BytesIO(b"module"))
+    tar_gz = buf.getvalue()
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("ip/file.v", "module")
+    files = {"/ip.tar.gz": tar_gz, "/ip.zip": buf.getvalue()}
+
+    requests = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(files[self.path])))
+            self.end_headers()
+            self.wfile.write(files[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    def fetch(name, path, filetype, cache_root=None):
+        config = {"name": "url", "url": url + path, "filetype": filetype}
+        files_root = str(tmp_path / name)
+        Url(config, str(tmp_path), files_root, cache_root).fetch()
+        with open(os.path.join(files_root, "ip", "file.v")) as f:
+            assert f.read() == "module"
+
+    try:
+        # Without a download cache, nothing is written to disk except for the
+        # extracted files
+        with monkeypatch.context() as m:
+            m.setattr(tempfile, "mkstemp", None)
+            fetch("tar", "/ip.tar.gz", "tar")
+            fetch("zip", "/ip.zip", "zip")
+
+        # Streamed tar files are stored in the download cache as well
+        cache_root = str(tmp_path / "cache")
+        fetch("cached_a", "/ip.tar.gz", "tar", cache_root)
+        fetch("cached_b", "/ip.tar.gz", "tar", cache_root)
+        assert requests == ["/ip.tar.gz", "/ip.zip", "/ip.tar.gz"]
+        (cached,) = [
+            f
+            for f in os.listdir(os.path.join(cache_root, "downloads"))
+            if not f.endswith(".lock")
+        ]
+        with open(os.path.join(cache_root, "downloads", cached), "rb") as f:
+            assert f.read() == tar_gz
+    finally:
+        server.shutdown()
+        server.server_close()